@@ -0,0 +1,92 @@
+import importlib.util
+import os
+import sys
+import tracemalloc
+
+# Traces the memory a few seeded matches of one game allocate, after a warm-up match has filled the
+# compile and dispatch caches. For every match it takes the most memory in use at once above what was
+# in use when it started, and the bytes and blocks (objects, for the most part) it still held when it
+# ended, before the next reset lets them go. Passing the root of another checkout traces its code and
+# config instead, to compare two versions on the same game.
+#
+#     python3 benchmarks/bench_allocations.py [game] [matches] [root]
+
+DEFAULT_GAME = '1v1'
+DEFAULT_MATCHES = 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if len(sys.argv) > 3:
+    ROOT = os.path.abspath(sys.argv[3])
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from strategy import *
+
+
+# The driver's file name isn't a module name, so it is loaded by path
+def load_manager(game_name):
+    directory = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        specification = importlib.util.spec_from_file_location('driver', os.path.join(ROOT, 'src', '5ebb.py'))
+        driver = importlib.util.module_from_spec(specification)
+        specification.loader.exec_module(driver)
+        config = driver.load_config()
+        config[MATCH] = game_name
+        return driver.unload_config(config)
+    finally:
+        os.chdir(directory)
+
+
+def get_size(snapshot):
+    statistics = snapshot.statistics('filename')
+    return sum(statistic.size for statistic in statistics), sum(statistic.count for statistic in statistics)
+
+
+class Allocations:
+    def __init__(self):
+        self.matches = 0
+        self.turns = 0
+        self.peak_bytes = 0
+        self.held_bytes = 0
+        self.held_blocks = 0
+
+    def add(self, match, seed):
+        match.reset(seed=seed)
+        start_bytes, start_blocks = get_size(tracemalloc.take_snapshot())
+        tracemalloc.reset_peak()
+        current_bytes = tracemalloc.get_traced_memory()[0]
+        match.simulate(sink=NullDisplayMessage)
+        self.peak_bytes += tracemalloc.get_traced_memory()[1] - current_bytes
+        end_bytes, end_blocks = get_size(tracemalloc.take_snapshot())
+        self.matches += 1
+        self.turns += match.get_turn()
+        self.held_bytes += end_bytes - start_bytes
+        self.held_blocks += end_blocks - start_blocks
+
+    def __str__(self):
+        return (str(self.matches) + ' matches, ' + format(self.turns / self.matches, '.1f') + ' turns each'
+                + '\npeak: ' + format(self.peak_bytes / self.matches, '.0f') + ' bytes per match'
+                + '\nheld at the end: ' + format(self.held_bytes / self.matches, '.0f') + ' bytes, '
+                + format(self.held_blocks / self.matches, '.0f') + ' blocks per match')
+
+
+def main():
+    game_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_GAME
+    match_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MATCHES
+    manager = load_manager(game_name)
+    allocations = Allocations()
+    try:
+        match = manager.get_match_template()
+        match.reset(strategies=manager.strategies, seed=match_count)
+        match.simulate(sink=NullDisplayMessage)
+        tracemalloc.start()
+        for seed in range(match_count):
+            allocations.add(match, seed)
+        tracemalloc.stop()
+    finally:
+        manager.close()
+    print(game_name + ' (' + ROOT + '): ' + str(allocations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from strategy import *
+
+# Times Strategy.choose_action at every decision of a few simulated matches, once hashing and comparing
+# contexts by their identity and once the way they were before: by str() and by name. Both are timed
+# back to back at the same decision, and the match carries on with the action chosen the current way.
+# choose_action looks its decision table up by actor, skill and target names, so it no longer hashes
+# contexts at all and times the same either way; filing the decision's actions in a dict of weights,
+# as the original choose_action did, is timed alongside it to show what each hash costs.
+#
+#     python3 benchmarks/bench_hashing.py [game] [matches]
+
+DEFAULT_GAME = '1v1'
+DEFAULT_MATCHES = 20
+REPEATS = 20
+
+
+def str_hash(context):
+    return str(context).__hash__()
+
+
+def name_equal(context, obj):
+    if is_map(obj):
+        return context.get(NAME) == obj.get(NAME)
+    else:
+        return False
+
+
+class StrHashing:
+    def __enter__(self):
+        self.functions = (BasicContext.__hash__, BasicContext.__eq__)
+        BasicContext.__hash__ = str_hash
+        BasicContext.__eq__ = name_equal
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        BasicContext.__hash__, BasicContext.__eq__ = self.functions
+
+
+# The driver's file name isn't a module name, so it is loaded by path
+def load_manager(game_name):
+    directory = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        specification = importlib.util.spec_from_file_location('driver', os.path.join(ROOT, 'src', '5ebb.py'))
+        driver = importlib.util.module_from_spec(specification)
+        specification.loader.exec_module(driver)
+        config = driver.load_config()
+        config[MATCH] = game_name
+        return driver.unload_config(config)
+    finally:
+        os.chdir(directory)
+
+
+def time_call(function):
+    start = time.perf_counter()
+    for i in range(REPEATS):
+        function()
+    return (time.perf_counter() - start) / REPEATS
+
+
+def hash_actions(actions):
+    weights = {}
+    for action in actions:
+        weights[action] = 0
+    return max(weights, key=weights.get)
+
+
+class Timings:
+    def __init__(self):
+        self.decisions = 0
+        self.actions = 0
+        self.choose_action = [0, 0]
+        self.hash_actions = [0, 0]
+
+    def add(self, choose_action, strategy, match, actions):
+        self.decisions += 1
+        self.actions += len(actions)
+        self.choose_action[0] += time_call(lambda: choose_action(strategy, match, actions))
+        self.hash_actions[0] += time_call(lambda: hash_actions(actions))
+        with StrHashing():
+            self.choose_action[1] += time_call(lambda: choose_action(strategy, match, actions))
+            self.hash_actions[1] += time_call(lambda: hash_actions(actions))
+
+    def __str__(self):
+        string = (str(self.decisions) + ' decisions, ' + format(self.actions / self.decisions, '.1f')
+                  + ' actions each')
+        for label, totals in (('choose_action', self.choose_action), ('action dict', self.hash_actions)):
+            identity, by_str = (total / self.decisions * 1e6 for total in totals)
+            string += ('\n' + label + ': ' + format(by_str, '.1f') + ' us before, ' + format(identity, '.1f')
+                       + ' us after (' + format(by_str / identity, '.1f') + 'x)')
+        return string
+
+
+def main():
+    game_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_GAME
+    match_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MATCHES
+    manager = load_manager(game_name)
+    timings = Timings()
+    choose_action = Strategy.choose_action
+
+    def timed_choose_action(strategy, match, actions):
+        timings.add(choose_action, strategy, match, actions)
+        return choose_action(strategy, match, actions)
+
+    Strategy.choose_action = timed_choose_action
+    try:
+        match = manager.get_match_template()
+        for seed in range(match_count):
+            match.reset(strategies=manager.strategies, seed=seed)
+            match.simulate(sink=NullDisplayMessage)
+    finally:
+        Strategy.choose_action = choose_action
+        manager.close()
+    print(game_name + ': ' + str(timings))
+
+
+if __name__ == '__main__':
+    main()
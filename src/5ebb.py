@@ -5,21 +5,16 @@ from basic import *
 # from display.display import Display
 from display.better_display import Display
 from strategy import StrategyManager
+from analytics import DEFAULT_ANALYSIS_MATCHES
 
 
 # Driver
 
 def unload_config(config):
-    environment = Environment()
-    BasicContext.environment = environment
-
-    environment.characters = get_concretes(config[CHARACTERS])
-    environment.skills = get_concretes(config[SKILLS])
-    environment.abilities = get_concretes(config[ABILITIES])
-    environment.resources = get_concretes(config[RESOURCES])
-
-    match_data = get_concretes(config[MATCHES])[config[MATCH]]
-    return StrategyManager(match_data, config[STRATEGY])
+    # Workers rebuild their environment from the config, so hand them an untouched copy
+    raw_config = copy.deepcopy(config)
+    environment = load_environment(config)
+    return StrategyManager(environment.match_data, config[STRATEGY], config=raw_config)
 
 
 def load_config():
@@ -35,45 +30,6 @@ def load(path):
     return json.load(open(path))
 
 
-def get_concretes(expression):
-    values = {}
-    concretes = {}
-
-    for key in expression:
-        value = expression[key]
-        if is_list(value):
-            concretes[key] = collapse_set(value, expression)
-        else:
-            if value.get(NAME) is None:
-                value[NAME] = key
-            if value.get(PROTOTYPE) is None:
-                value[PROTOTYPE] = False
-
-            if PROTOTYPES in value:
-                properties = {}
-                shallow_fill(properties, value.get(PROPERTIES))
-                for prototype_name in value[PROTOTYPES]:
-                    prototype = values[prototype_name]
-                    shallow_fill(properties, prototype.get(PROPERTIES))
-                    deep_fill(value, prototype)
-                value[PROPERTIES] = properties
-
-            values[key] = value
-
-    for v_key in values:
-        value = values[v_key]
-        if not value.get(PROTOTYPE):
-            properties = pop(value, PROPERTIES)
-            if properties is not None:
-                for p_key in properties:
-                    p_value = properties[p_key]
-                    value = map_dict(value, lambda x: check_and_replace(x, p_key, p_value))
-
-            concretes[v_key] = value
-
-    return concretes
-
-
 # TODO: this unholy method and it's perverse usage
 #  is an assault on both man and Christendom.
 #  For the love of all that is righteous please refactor.
@@ -84,15 +40,56 @@ def report_strategies(manager, display):
         report_strategy(manager.strategies[strategy_name], display)
 
 
-def report_strategy(strategy, display):
+# An optimization also reports how many matches it simulated in all, out of its budget
+def report_strategy(strategy, display, simulation_counts=None):
     report = '<Strategy> ' + strategy.name + ' fitness of [' + str(strategy.fitness) + ']'
+    if simulation_counts is not None:
+        simulations, budget = simulation_counts
+        report += ('\nSimulated ' + str(simulations) + ' of ' + str(budget) + ' matches, saving '
+                   + str(budget - simulations))
     for node in strategy.nodes:
         report += '\n' + THICK_DIVIDER + '\n'
         report += str(node)
     display.input(string=report)
 
 
+# python3 src/5ebb.py analyze [game] [matches] plays the game's matches with the default strategies
+# and prints their analytics, without starting the display
+def analyze(arguments):
+    config = load_config()
+    manager = unload_config(config)
+    game_name = arguments[0] if len(arguments) > 0 else None
+    count = int(arguments[1]) if len(arguments) > 1 else DEFAULT_ANALYSIS_MATCHES
+    try:
+        print(manager.analyze(count, game_name))
+    finally:
+        manager.close()
+
+
+# python3 src/5ebb.py damage [game] prints the expected damage of each character's attacking skills
+# against the others as the game opens, as the expected_damage tie break weighs them
+def report_expected_damages(arguments):
+    config = load_config()
+    manager = unload_config(config)
+    game_name = arguments[0] if len(arguments) > 0 else None
+    try:
+        damages = manager.get_expected_damages(game_name)
+    finally:
+        manager.close()
+    for actor_name, skill_name, target_name in damages:
+        damage = damages[(actor_name, skill_name, target_name)]
+        print(actor_name + ' ' + skill_name + ' at ' + target_name + ': '
+              + ('not analyzable' if damage is None else str(round(damage, 3))))
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == COMMAND_ANALYZE:
+        analyze(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == COMMAND_DAMAGE:
+        report_expected_damages(sys.argv[2:])
+        return
+
     display = Display(finalizer=Finalizer())
     config = load_config()
     # display.print(json.dumps(config))
@@ -111,6 +108,7 @@ def main():
         # user_input = ''
 
         if re_match(REGEX_QUIT, user_input):
+            manager.close()
             quit()
         elif re_match(REGEX_START, user_input):
             manager.step(display)
@@ -118,19 +116,19 @@ def main():
             report_strategies(manager, display)
         elif re_match(REGEX_OPTIMIZE, user_input):
             for strategy_name in manager.strategies:
-                manager.optimize(strategy_name)
+                simulation_counts = manager.optimize(strategy_name)
                 optimization_count += 1
 
                 strategy = manager.strategies[strategy_name]
-                report_strategy(strategy, display)
+                report_strategy(strategy, display, simulation_counts)
         else:
             strategy = manager.strategies[user_input]
             if strategy is None:
                 display_invalid(display)
             else:
-                manager.optimize(strategy.name)
+                simulation_counts = manager.optimize(strategy.name)
                 optimization_count += 1
-                report_strategy(strategy, display)
+                report_strategy(manager.strategies[strategy.name], display, simulation_counts)
 
 
 if __name__ == '__main__':
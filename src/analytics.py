@@ -0,0 +1,144 @@
+from match import *
+
+
+# Analytics
+#
+# Plays many matches of one game and streams each into a MatchAggregate: who won, how many turns it
+# took, the hit points every character was left with and the damage each skill did. Every figure is
+# kept as running statistics and a histogram, so an aggregate stays the same size however many matches
+# it has seen, and aggregates gathered in separate workers merge exactly.
+
+DEFAULT_ANALYSIS_MATCHES = 1000
+ANALYSIS_BATCH_SIZE = 250
+QUANTILES = (0.05, 0.5, 0.95)
+NO_SKILL = 'outside of skills'
+
+
+# Running statistics and a histogram of the same values
+class Tally:
+    def __init__(self):
+        self.statistics = RunningStatistics()
+        self.histogram = Histogram()
+
+    def add(self, value):
+        self.statistics.add(value)
+        self.histogram.add(value)
+
+    def merge(self, tally):
+        self.statistics.merge(tally.statistics)
+        self.histogram.merge(tally.histogram)
+
+    def get_total(self):
+        return self.statistics.mean * self.statistics.count
+
+    def __str__(self):
+        string = 'mean ' + format_number(self.statistics.mean)
+        string += ', sd ' + format_number(self.statistics.get_standard_deviation())
+        for q in QUANTILES:
+            string += ', ' + str(round(q * 100)) + '% ' + format_number(self.histogram.get_quantile(q))
+        return string
+
+
+class MatchAggregate:
+    def __init__(self):
+        self.matches = 0
+        # Wins per alignment name; a match that ends without one side standing is a draw
+        self.wins = {}
+        self.draws = 0
+        self.turns = Tally()
+        self.hit_points = {}
+        self.skill_damage = {}
+
+    # Called by the match for every bit of damage done during simulate
+    def add_damage(self, action, actor, target, damage):
+        skill_name = NO_SKILL if action is None else action.skill_name
+        tally = self.skill_damage.get(skill_name)
+        if tally is None:
+            tally = Tally()
+            self.skill_damage[skill_name] = tally
+        tally.add(damage)
+
+    def add_match(self, match):
+        self.matches += 1
+        if match.is_conflict() or len(match.alignment_counts) == 0:
+            self.draws += 1
+        else:
+            winner = next(iter(match.alignment_counts))
+            self.wins[winner] = self.wins.get(winner, 0) + 1
+        self.turns.add(match.get_turn())
+        # Characters sharing a name are told apart by the order they were created in
+        name_counts = {}
+        for character in match.match_characters:
+            name_count = name_counts.get(character.name, 0) + 1
+            name_counts[character.name] = name_count
+            name = character.name if name_count == 1 else character.name + ' (' + str(name_count) + ')'
+            tally = self.hit_points.get(name)
+            if tally is None:
+                tally = Tally()
+                self.hit_points[name] = tally
+            tally.add(character.resources.get_quantity(HIT_POINT))
+
+    def merge(self, aggregate):
+        self.matches += aggregate.matches
+        for alignment_name in aggregate.wins:
+            self.wins[alignment_name] = self.wins.get(alignment_name, 0) + aggregate.wins[alignment_name]
+        self.draws += aggregate.draws
+        self.turns.merge(aggregate.turns)
+        merge_tallies(self.hit_points, aggregate.hit_points)
+        merge_tallies(self.skill_damage, aggregate.skill_damage)
+
+    # A win probability and its standard error
+    def get_win_probability(self, alignment_name):
+        if self.matches == 0:
+            return 0, math.inf
+        probability = self.wins.get(alignment_name, 0) / self.matches
+        return probability, math.sqrt(probability * (1 - probability) / self.matches)
+
+    def __str__(self):
+        string = 'Matches played: ' + str(self.matches)
+        string += THIN_DIVIDER + 'Win probability'
+        for alignment_name in sorted(self.wins):
+            probability, error = self.get_win_probability(alignment_name)
+            string += '\n' + alignment_name + ': ' + format_number(probability) + ' +/- ' + format_number(error)
+        string += '\ndraw: ' + format_number(self.draws / self.matches if self.matches > 0 else 0)
+
+        string += THIN_DIVIDER + 'Turns to finish\n' + str(self.turns)
+        for turn in sorted(self.turns.histogram.counts):
+            string += '\n' + str(turn) + ': ' + format_number(self.turns.histogram.get_fraction(turn))
+
+        string += THIN_DIVIDER + 'Hit points remaining'
+        for name in sorted(self.hit_points):
+            tally = self.hit_points[name]
+            string += '\n' + name + ': ' + str(tally) + ', down ' + format_number(tally.histogram.get_fraction(0))
+
+        string += THIN_DIVIDER + 'Damage dealt per skill'
+        for skill_name in sorted(self.skill_damage):
+            tally = self.skill_damage[skill_name]
+            string += ('\n' + skill_name + ': ' + format_number(tally.get_total() / self.matches) + ' per match, '
+                       + str(tally.statistics.count) + ' hits, per hit ' + str(tally))
+        return string
+
+
+def merge_tallies(tallies, other_tallies):
+    for name in other_tallies:
+        tally = tallies.get(name)
+        if tally is None:
+            tally = Tally()
+            tallies[name] = tally
+        tally.merge(other_tallies[name])
+
+
+# Plays the match once per seed, on the object engine since the batch engine doesn't report damage
+def get_aggregate(match, strategies, seeds):
+    aggregate = MatchAggregate()
+    for seed in seeds:
+        match.reset(strategies=strategies, seed=seed)
+        match.simulate(sink=NullDisplayMessage, observer=aggregate)
+        aggregate.add_match(match)
+    return aggregate
+
+
+def format_number(number):
+    if number is None:
+        return '-'
+    return str(round(number, 3))
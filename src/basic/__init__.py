@@ -2,7 +2,17 @@ import random
 import json
 import re
 import os
+import math
+import copy
+import itertools
+import operator
 from collections.abc import MutableMapping, MutableSequence, Hashable
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from model.json_def import *
 from model.prompts import *
 from basic.basics import *
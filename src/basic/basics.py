@@ -3,24 +3,157 @@ from basic import *
 
 # Models
 
+DIE_BLOCK_SIZE = 256
+
+
+# Dice are drawn a block at a time for each die size, and served from the block until it runs out.
+# Every size draws from the one seeded generator, so a seeded die rolls the same way every time
+class Die:
+    def __init__(self, seed=None):
+        self.generator = None
+        # Per die size, the block being served and the position of its next die
+        self.streams = {}
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        if numpy is not None:
+            self.generator = numpy.random.default_rng(seed)
+        else:
+            self.generator = random.Random(seed)
+        self.streams = {}
+
+    def roll(self, die_count, sides):
+        stream = self.streams.get(sides)
+        if stream is None or stream[1] + die_count > len(stream[0]):
+            stream = [self.draw_block(sides, max(DIE_BLOCK_SIZE, die_count)), 0]
+            self.streams[sides] = stream
+        block, position = stream
+        stream[1] = position + die_count
+        if die_count == 1:
+            return block[position]
+        return sum(block[position:position + die_count])
+
+    # Uniform on 1 to sides either way; NumPy draws the block in one call
+    def draw_block(self, sides, size):
+        if numpy is not None:
+            return self.generator.integers(1, sides + 1, size=size).tolist()
+        return [self.generator.randint(1, sides) for i in range(size)]
+
+
+# What a name is on a class never changes, so it is looked up once per class. A slot only counts
+# as an attribute once it is set, and an instance can add attributes of its own through its __dict__
+def has_attribute(context, name):
+    klass = type(context)
+    kind = klass.attribute_names.get(name)
+    if kind is None:
+        kind = get_attribute_kind(klass, name)
+        klass.attribute_names[name] = kind
+    if kind == SLOT_ATTRIBUTE:
+        return hasattr(context, name)
+    return kind == CLASS_ATTRIBUTE or name in getattr(context, '__dict__', ())
+
+
+def get_attribute_kind(klass, name):
+    if any(name in vars(base).get('__slots__', ()) for base in klass.__mro__):
+        return SLOT_ATTRIBUTE
+    elif hasattr(klass, name):
+        return CLASS_ATTRIBUTE
+    return NO_ATTRIBUTE
+
+
+# How a value found by get is wrapped depends only on its type
+def get_value_kind(value):
+    value_type = type(value)
+    kind = value_kinds.get(value_type)
+    if kind is None:
+        if is_context(value):
+            kind = CONTEXT_VALUE
+        elif is_evaluable(value):
+            kind = EVALUABLE_VALUE
+        else:
+            kind = PLAIN_VALUE
+        value_kinds[value_type] = kind
+    return kind
+
+
+# The slots a view shares with the context it overlays; the rest it sets for itself (see overlay)
+def get_slot_names(klass):
+    return [name for base in klass.__mro__ for name in vars(base).get('__slots__', ())
+            if name not in ('base', 'temp_atr', 'evaluables', 'copy_on_write', 'resolved')]
+
+
+def get_dispatch_table(klass, names_attribute):
+    names = {}
+    for base in reversed(klass.__mro__):
+        names.update(vars(base).get(names_attribute, {}))
+    return {key: getattr(klass, name) for key, name in names.items()}
+
+
+# Operators and effects are dispatched through tables built once per class, from the method names in
+# function_names and effect_names along the class's MRO, so a subclass only names what it adds or overrides.
+# Contexts outside a match share one Die; a match's contexts roll on the match's own (see get_die)
 class BasicContext(MutableMapping, Hashable):
+    __slots__ = ('identity', 'base', 'name', 'properties', 'initiative', 'match', 'temp_atr', 'evaluables',
+                 'copy_on_write', 'resolved', 'revision')
     environment = None
     logger = None
-
+    identities = itertools.count()
+    die = Die()
+    function_names = {
+        CONTEXT: 'context',
+        ADDITION: 'add',
+        SUBTRACTION: 'subtract',
+        MULTIPLICATION: 'multiply',
+        DIVISION: 'divide',
+        GREATER: 'greater',
+        LESS: 'less',
+        GREATER_OR_EQUAL: 'greater_or_equal',
+        LESS_OR_EQUAL: 'less_or_equal',
+        MAXIMUM: 'maximum',
+        MINIMUM: 'minimum',
+        MAP: 'func_map',
+        CONTAINS: 'contains',
+        OR: 'func_or',
+        AND: 'func_and',
+        NOT: 'func_not',
+        GET: 'func_get',
+        EVAL: 'eval',
+        DIE_ROLL: 'roll',
+        SET_TEMP: 'set_temp_func'
+    }
+    effect_names = {}
+    function_map = {}
+    effect_map = {}
+    attribute_names = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.attribute_names = {}
+        cls.slot_names = get_slot_names(cls)
+        cls.function_map = get_dispatch_table(cls, 'function_names')
+        cls.effect_map = get_dispatch_table(cls, 'effect_names')
+
+    # Contexts are equal when they are views of the same context (see re_context);
+    # plain maps are still compared by name
     def __eq__(self, obj):
-        if is_map(obj):
+        if isinstance(obj, BasicContext):
+            return self.identity == obj.identity
+        elif is_map(obj):
             return self.get(NAME) == obj.get(NAME)
         else:
             return False
 
     def __hash__(self) -> int:
-        return str(self).__hash__()
+        return self.identity
 
     def __setitem__(self, key, value):
         self.set(key, value)
 
     def __delitem__(self, value):
+        self.own_properties()
         self.properties.__delitem__(value)
+        self.unresolve(value)
+        self.revision += 1
 
     def __getitem__(self, key):
         return self.get(key)
@@ -32,6 +165,7 @@ class BasicContext(MutableMapping, Hashable):
         return self.properties.__iter__()
 
     def __init__(self, properties=None, name='', base=None):
+        self.identity = next(BasicContext.identities)
         self.base = base
         # if name == '' and base is not None:
         #     name = base.get(NAME)
@@ -40,31 +174,12 @@ class BasicContext(MutableMapping, Hashable):
         self.properties = {NAME: name}
         self.initiative = None
         self.match = None
-        self.die = Die()
         self.temp_atr = {}
-        self.effect_map = {}
-        self.function_map = {
-            CONTEXT: self.context,
-            ADDITION: self.add,
-            SUBTRACTION: self.subtract,
-            MULTIPLICATION: self.multiply,
-            DIVISION: self.divide,
-            GREATER: self.greater,
-            LESS: self.less,
-            GREATER_OR_EQUAL: self.greater_or_equal,
-            LESS_OR_EQUAL: self.less_or_equal,
-            MAXIMUM: self.maximum,
-            MINIMUM: self.minimum,
-            MAP: self.func_map,
-            CONTAINS: self.contains,
-            OR: self.func_or,
-            AND: self.func_and,
-            NOT: self.func_not,
-            GET: self.func_get,
-            EVAL: self.eval,
-            DIE_ROLL: self.roll,
-            SET_TEMP: self.set_temp_func
-        }
+        self.evaluables = None
+        self.copy_on_write = False
+        self.resolved = None
+        # Counts the times a property was set or deleted, so callers can tell the properties changed
+        self.revision = 0
 
         if properties is not None:
             for key in properties:
@@ -148,7 +263,7 @@ class BasicContext(MutableMapping, Hashable):
         for argument in arguments[1:]:
             argument_eval = self.eval(argument, display_message=display_message)
             if argument_eval < value:
-                value = argument
+                value = argument_eval
         return value
 
     def func_map(self, expression, display_message=None):
@@ -196,9 +311,9 @@ class BasicContext(MutableMapping, Hashable):
     def roll(self, expression, display_message=None):
         die_count = self.eval(expression[DIE_COUNT], display_message=display_message)
         die_sides = self.eval(expression[DIE_SIDES], display_message=display_message)
-        roll = self.die.roll(die_count, die_sides)
-        roll_string = str(self) + " rolled [" + str(die_count) + "d" + str(die_sides) + "]\n" + str(roll)
-        if display_message is not None:
+        roll = self.get_die().roll(die_count, die_sides)
+        if is_displayed(display_message):
+            roll_string = str(self) + " rolled [" + str(die_count) + "d" + str(die_sides) + "]\n" + str(roll)
             display_message.add_section(roll_string, level=3)
         return roll
 
@@ -215,82 +330,163 @@ class BasicContext(MutableMapping, Hashable):
         self.set_temp(ACTOR, actor)
         effect = self.effect_map.get(expression[PROFILE])
         if effect is not None:
-            effect(expression, display_message=display_message)
+            effect(self, expression, display_message=display_message)
         self.clear_temp(ACTOR)
 
     def check_conditions(self, conditions=None, display_message=None):
-        return self.func_and({ARGUMENTS: conditions}, display_message=display_message) if conditions is not None else False
+        if conditions is None:
+            return False
+        return get_compiled_conditions(conditions)(self, display_message)
 
     def get_match(self):
         return self.match if self.match is not None else self.base.get_match()
 
+    # Rolls go through the match's die when there is one, keeping each match's dice on its own stream
+    def get_die(self):
+        context = self
+        while context is not None:
+            if context.match is not None:
+                return context.match.die
+            context = context.base
+        return self.die
+
     def set_match(self, match):
         self.set(MATCH, match)
         self.match = match
 
     def eval(self, expression, display_message=None):
-        try:
-            return_value = None
-            if is_evaluable(expression):
-                key = get_child_key(expression)
-                func = self.function_map.get(key)
-                if key == NULLABLE:
-                    return Nullable(self.eval(expression[key]))
-                elif func is not None:
-                    return_value = func(expression[key], display_message=display_message)
-                else:
-                    value = self.get(key)
-                    if value is not None:
-                        return_value = value.eval(expression[key], display_message=display_message)
+        if type(expression) is dict:
+            return get_compiled(expression)(self, display_message)
+        elif is_evaluable(expression):
+            return self.interpret(expression, display_message=display_message)
+        else:
+            return expression
+
+    # Reference interpreter; the compiled closures in get_compiled must agree with it
+    def interpret(self, expression, display_message=None):
+        return_value = None
+        if is_evaluable(expression):
+            key = get_child_key(expression)
+            func = self.function_map.get(key)
+            if key == NULLABLE:
+                return Nullable(self.eval(expression[key]))
+            elif func is not None:
+                return_value = func(self, expression[key], display_message=display_message)
             else:
-                return_value = expression
-        except Exception as exception:
-            raise exception
+                value = self.get(key)
+                if value is not None:
+                    return_value = value.eval(expression[key], display_message=display_message)
+        else:
+            return_value = expression
         return return_value
 
+    # A context seen from this one: a view of it that falls back on its own base, then on this context.
+    # Nothing is copied up front; the view shares the context's properties until it sets one of its own
     def re_context(self, base):
-        klass = BasicContext
         if is_context(base):
-            properties = base.properties
-            deep_fill(properties, base.base)
-            klass = type(base)
-        else:
-            properties = base
-        return klass(properties=properties, base=self)
+            return base.overlay(self if base.base is None else self.re_context(base.base))
+        return BasicContext(properties=base, base=self)
+
+    def overlay(self, base):
+        klass = type(self)
+        context = klass.__new__(klass)
+        for name in klass.slot_names:
+            value = getattr(self, name, context)
+            if value is not context:
+                setattr(context, name, value)
+        if hasattr(self, '__dict__'):
+            context.__dict__.update(self.__dict__)
+        context.base = base
+        context.temp_atr = {}
+        context.evaluables = None
+        context.copy_on_write = True
+        context.resolved = None
+        return context
+
+    def own_properties(self):
+        if self.copy_on_write:
+            self.properties = dict(self.properties)
+            self.copy_on_write = False
 
     def get(self, key):
-        if hasattr(self, str(key)):
-            value = getattr(self, str(key))
-        else:
+        source = None if self.resolved is None else self.resolved.get(key)
+        if source is None:
+            source = self.resolve(key)
+        if source is self:
             value = self.properties.get(key)
+        elif type(source) is str:
+            value = getattr(self, source, None)
+        else:
+            value = None
 
         if (value is None) and (self.base is not None):
             value = self.base.get(key)
 
-        if is_context(value):
-            value = self.re_context(value)
-        elif is_evaluable(value):
-            value = Evaluable(value, base=self)
-
         if value is None:
-            value = self.temp_atr.get(key)
+            return self.temp_atr.get(key)
 
+        kind = get_value_kind(value)
+        if kind == CONTEXT_VALUE:
+            value = self.re_context(value)
+        elif kind == EVALUABLE_VALUE:
+            value = self.get_evaluable(key, value)
         return value
 
+    # Where get finds a key on this context: the attribute of that name, this context's own properties, or
+    # only its base. It is kept until the key is set, set or cleared as a temp, or the base changes. A view
+    # shares the properties of the context it overlays, which can gain the key, so it always looks there;
+    # so does a slot that isn't set yet, which can be set at any time
+    def resolve(self, key):
+        name = str(key)
+        if has_attribute(self, name):
+            source = name
+        elif self.base is not None and not self.copy_on_write and key not in self.properties:
+            source = self.base
+        else:
+            source = self
+        if type(self).attribute_names[name] != SLOT_ATTRIBUTE or source is name:
+            if self.resolved is None:
+                self.resolved = {}
+            self.resolved[key] = source
+        return source
+
+    def unresolve(self, key=None):
+        if self.resolved is not None:
+            if key is None:
+                self.resolved = None
+            else:
+                self.resolved.pop(key, None)
+
+    # A dict read through get is wrapped once, and the wrapper reused for as long as the same dict is found
+    def get_evaluable(self, key, value):
+        if self.evaluables is None:
+            self.evaluables = {}
+        evaluable = self.evaluables.get(key)
+        if evaluable is None or evaluable[0] is not value:
+            evaluable = (value, Evaluable(value, base=self))
+            self.evaluables[key] = evaluable
+        return evaluable[1]
+
+    # Properties are mirrored onto attributes of the same name, but never onto methods
     def set(self, key, value):
+        self.own_properties()
         self.properties[key] = value
+        self.unresolve(key)
+        self.revision += 1
 
-        if hasattr(self, key):
+        if hasattr(self, key) and not callable(getattr(type(self), key, None)):
             setattr(self, key, value)
 
     def set_temp(self, key, value):
         self.temp_atr[key] = value
+        self.unresolve(key)
 
     def clear_temp(self, attribute=None):
         if attribute is not None:
             self.temp_atr.pop(attribute)
         else:
             self.temp_atr = {}
+        self.unresolve(attribute)
 
     def log(self, string):
         if self.logger is not None:
@@ -300,15 +496,23 @@ class BasicContext(MutableMapping, Hashable):
         return '<' + type(self).__name__ + '> ' + self.name
 
 
+BasicContext.slot_names = get_slot_names(BasicContext)
+BasicContext.function_map = get_dispatch_table(BasicContext, 'function_names')
+
+
 # TODO: make this class support all int, list, and dict operations
 #  so I don't have to null-check eval functions
 class Nullable(BasicContext):
+    __slots__ = ('value',)
+
     def __init__(self, value, properties=None, name='', base=None):
         self.value = value
         super().__init__(properties, name, base)
 
 
 class Evaluable(BasicContext):
+    __slots__ = ()
+
     def __init__(self, properties=None, name='', base=None):
         super().__init__(properties, name, base)
 
@@ -319,10 +523,21 @@ class Environment(BasicContext):
         self.abilities = {}
         self.skills = {}
         self.resources = {}
+        self.resource_ids = {}
+        self.matches = {}
         self.match_data = None
         super().__init__(properties, name, base)
 
 
+CONTEXT_VALUE = 0
+EVALUABLE_VALUE = 1
+PLAIN_VALUE = 2
+NO_ATTRIBUTE = 0
+CLASS_ATTRIBUTE = 1
+SLOT_ATTRIBUTE = 2
+value_kinds = {}
+
+
 def get_d20():
     return {DIE_COUNT: 1, DIE_SIDES: 20}
 
@@ -331,6 +546,15 @@ def get_child_key(expression):
     return list(expression.keys())[0]
 
 
+# Whether the key appears anywhere in the expression, at any depth
+def contains_key(expression, key):
+    if is_map(expression):
+        return any(child_key == key or contains_key(expression[child_key], key) for child_key in expression)
+    elif is_list(expression):
+        return any(contains_key(item, key) for item in expression)
+    return False
+
+
 def pop(expression, key):
     if key in expression:
         return expression.pop(key)
@@ -421,6 +645,60 @@ def create_contexts(expression, context_type, base=None):
     return contexts
 
 
+def get_concretes(expression):
+    values = {}
+    concretes = {}
+
+    for key in expression:
+        value = expression[key]
+        if is_list(value):
+            concretes[key] = collapse_set(value, expression)
+        else:
+            if value.get(NAME) is None:
+                value[NAME] = key
+            if value.get(PROTOTYPE) is None:
+                value[PROTOTYPE] = False
+
+            if PROTOTYPES in value:
+                properties = {}
+                shallow_fill(properties, value.get(PROPERTIES))
+                for prototype_name in value[PROTOTYPES]:
+                    prototype = values[prototype_name]
+                    shallow_fill(properties, prototype.get(PROPERTIES))
+                    deep_fill(value, prototype)
+                value[PROPERTIES] = properties
+
+            values[key] = value
+
+    for v_key in values:
+        value = values[v_key]
+        if not value.get(PROTOTYPE):
+            properties = pop(value, PROPERTIES)
+            if properties is not None:
+                for p_key in properties:
+                    p_value = properties[p_key]
+                    value = map_dict(value, lambda x: check_and_replace(x, p_key, p_value))
+
+            concretes[v_key] = value
+
+    return concretes
+
+
+def load_environment(config):
+    environment = Environment()
+    BasicContext.environment = environment
+
+    environment.characters = get_concretes(config[CHARACTERS])
+    environment.skills = get_concretes(config[SKILLS])
+    environment.abilities = get_concretes(config[ABILITIES])
+    environment.resources = get_concretes(config[RESOURCES])
+    environment.resource_ids = {resource_name: resource_id
+                                for resource_id, resource_name in enumerate(environment.resources)}
+    environment.matches = get_concretes(config[MATCHES])
+    environment.match_data = environment.matches[config[MATCH]]
+    return environment
+
+
 def is_map(context):
     return issubclass(type(context), MutableMapping)
 
@@ -441,6 +719,10 @@ def is_context(context):
     return not is_evaluable(context) and issubclass(type(context), BasicContext)
 
 
+def is_displayed(display_message):
+    return display_message is not None and display_message.active
+
+
 def checked_input(display, string='', prompt='', reg=REGEX_ALL):
     user_input = display.input(string, prompt).lower()
     while not re_match(reg, user_input):
@@ -461,15 +743,308 @@ def re_match(reg, string):
     return not (re.match(reg.lower(), string.lower()) is None)
 
 
-class Die:
-    def __init__(self, rand_func=random.randint):
-        self.rand_func = rand_func
+# Compiler
+#
+# 5ebb-JSON expressions are compiled once into closures of the form
+# closure(context, display_message). Closures are cached by expression identity,
+# so expressions are assumed to be left unmodified once they have been evaluated.
+# Operators that subclasses may override or that are inherently dynamic
+# (rolls, set_property, eval, map, ...) are dispatched through the context's function_map.
 
-    def roll(self, die_count, sides):
+COMPILE_CACHE_LIMIT = 65536
+compiled_expressions = {}
+compiled_conditions = {}
+
+
+def get_compiled(expression):
+    entry = compiled_expressions.get(id(expression))
+    if entry is None or entry[0] is not expression:
+        entry = (expression, compile_expression(expression))
+        cache_compiled(compiled_expressions, expression, entry)
+    return entry[1]
+
+
+def get_compiled_conditions(conditions):
+    entry = compiled_conditions.get(id(conditions))
+    if entry is None or entry[0] is not conditions:
+        entry = (conditions, compile_and({ARGUMENTS: conditions}))
+        cache_compiled(compiled_conditions, conditions, entry)
+    return entry[1]
+
+
+def cache_compiled(cache, expression, entry):
+    # Entries hold a reference to their expression, so an id can't be recycled while cached
+    if len(cache) >= COMPILE_CACHE_LIMIT:
+        cache.clear()
+    cache[id(expression)] = entry
+
+
+def compile_expression(expression):
+    if type(expression) is not dict:
+        if is_evaluable(expression):
+            return lambda context, display_message: context.interpret(expression, display_message=display_message)
+        else:
+            return lambda context, display_message: expression
+
+    key = get_child_key(expression)
+    compiler = compiler_map.get(key)
+    if compiler is not None:
+        return compiler(expression[key])
+    else:
+        return compile_dynamic(key, expression[key])
+
+
+def compile_arguments(expression):
+    return [compile_expression(argument) for argument in expression[ARGUMENTS]]
+
+
+def compile_dynamic(key, expression):
+    def dynamic(context, display_message):
+        func = context.function_map.get(key)
+        if func is not None:
+            return func(context, expression, display_message=display_message)
+        value = context.get(key)
+        if value is not None:
+            return value.eval(expression, display_message=display_message)
+        return None
+
+    return dynamic
+
+
+def compile_nullable(expression):
+    value = compile_expression(expression)
+    return lambda context, display_message: Nullable(value(context, None))
+
+
+def compile_context(expression):
+    value = expression[VALUE]
+    if is_evaluable(value):
+        key = compile_expression(value)
+        return lambda context, display_message: context.get(key(context, display_message))
+    else:
+        return lambda context, display_message: context.get(value)
+
+
+def compile_add(expression):
+    arguments = compile_arguments(expression)
+
+    def add(context, display_message):
         count = 0
-        for i in range(die_count):
-            count += self.rand_func(1, sides)
-            return count
+        for argument in arguments:
+            count += argument(context, display_message)
+        return count
+
+    return add
+
+
+def compile_subtract(expression):
+    first, *arguments = compile_arguments(expression)
+
+    def subtract(context, display_message):
+        count = first(context, display_message)
+        for argument in arguments:
+            count -= argument(context, display_message)
+        return count
+
+    return subtract
+
+
+def compile_multiply(expression):
+    first, *arguments = compile_arguments(expression)
+
+    def multiply(context, display_message):
+        count = first(context, display_message)
+        for argument in arguments:
+            count *= argument(context, display_message)
+        return count
+
+    return multiply
+
+
+def compile_divide(expression):
+    first, *arguments = compile_arguments(expression)
+
+    def divide(context, display_message):
+        count = first(context, display_message)
+        for argument in arguments:
+            count /= argument(context, display_message)
+        return count
+
+    return divide
+
+
+def compile_comparison(comparator):
+    def compile_comparator(expression):
+        first, *arguments = compile_arguments(expression)
+
+        def compare(context, display_message):
+            value = first(context, display_message)
+            for argument in arguments:
+                if not comparator(value, argument(context, display_message)):
+                    return False
+            return True
+
+        return compare
+
+    return compile_comparator
+
+
+def compile_maximum(expression):
+    first, *arguments = compile_arguments(expression)
+
+    def maximum(context, display_message):
+        value = first(context, display_message)
+        for argument in arguments:
+            argument_eval = argument(context, display_message)
+            if argument_eval > value:
+                value = argument_eval
+        return value
+
+    return maximum
+
+
+def compile_minimum(expression):
+    first, *arguments = compile_arguments(expression)
+
+    def minimum(context, display_message):
+        value = first(context, display_message)
+        for argument in arguments:
+            argument_eval = argument(context, display_message)
+            if argument_eval < value:
+                value = argument_eval
+        return value
+
+    return minimum
+
+
+def compile_contains(expression):
+    first, *arguments = compile_arguments(expression)
+
+    def contains(context, display_message):
+        value = first(context, display_message)
+        for argument in arguments:
+            if argument(context, display_message) not in value:
+                return False
+        return True
+
+    return contains
+
+
+def compile_and(expression):
+    arguments = compile_arguments(expression)
+
+    def func_and(context, display_message):
+        for argument in arguments:
+            if not argument(context, display_message):
+                return False
+        return True
+
+    return func_and
+
+
+def compile_or(expression):
+    arguments = compile_arguments(expression)
+
+    def func_or(context, display_message):
+        for argument in arguments:
+            if argument(context, display_message):
+                return True
+        return False
+
+    return func_or
+
+
+def compile_not(expression):
+    value = compile_expression(expression[ARGUMENTS])
+    return lambda context, display_message: not value(context, display_message)
+
+
+def compile_get(expression):
+    collection, key = compile_arguments(expression)[:2]
+    return lambda context, display_message: collection(context, display_message).get(key(context, display_message))
+
+
+compiler_map = {
+    NULLABLE: compile_nullable,
+    CONTEXT: compile_context,
+    ADDITION: compile_add,
+    SUBTRACTION: compile_subtract,
+    MULTIPLICATION: compile_multiply,
+    DIVISION: compile_divide,
+    GREATER: compile_comparison(operator.gt),
+    LESS: compile_comparison(operator.lt),
+    GREATER_OR_EQUAL: compile_comparison(operator.ge),
+    LESS_OR_EQUAL: compile_comparison(operator.le),
+    MAXIMUM: compile_maximum,
+    MINIMUM: compile_minimum,
+    CONTAINS: compile_contains,
+    OR: compile_or,
+    AND: compile_and,
+    NOT: compile_not,
+    GET: compile_get
+}
+
+
+# Welford's online mean and variance; statistics gathered separately merge exactly (Chan et al.)
+class RunningStatistics:
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, statistics):
+        if statistics.count == 0:
+            return
+        count = self.count + statistics.count
+        delta = statistics.mean - self.mean
+        self.mean += delta * statistics.count / count
+        self.m2 += statistics.m2 + delta * delta * self.count * statistics.count / count
+        self.count = count
+
+    def get_variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.inf
+
+    def get_standard_error(self):
+        return math.sqrt(self.get_variance() / self.count) if self.count > 0 else math.inf
+
+    def get_standard_deviation(self):
+        return math.sqrt(self.get_variance())
+
+
+# A count per distinct value. Values in a match (turns, hit points, damage) are small integers, so this is
+# an exact quantile sketch whose size is bounded by their range rather than by how many were added
+class Histogram:
+    def __init__(self, counts=None):
+        self.counts = {} if counts is None else counts
+        self.count = sum(self.counts.values())
+
+    def add(self, value, count=1):
+        self.counts[value] = self.counts.get(value, 0) + count
+        self.count += count
+
+    def merge(self, histogram):
+        for value in histogram.counts:
+            self.add(value, histogram.counts[value])
+
+    # The smallest value with at least the fraction q of the values at or below it
+    def get_quantile(self, q):
+        if self.count == 0:
+            return None
+        cumulative = 0
+        for value in sorted(self.counts):
+            cumulative += self.counts[value]
+            if cumulative >= q * self.count:
+                return value
+        return value
+
+    def get_fraction(self, value):
+        return self.counts.get(value, 0) / self.count if self.count > 0 else 0
 
 
 # shh shhhh, we don't talk about this class
@@ -0,0 +1,678 @@
+from match import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Batch
+#
+# Plays many matches of one game in lockstep, holding every match's resources,
+# initiative, turn and in-play state in arrays. The game's skills, abilities and
+# strategies are compiled once into closures over those arrays, each running on a
+# Frame: the subset of matches a step applies to. Anything the compiler can't
+# express raises Unvectorizable, and the whole batch falls back to the object engine.
+
+STATIC_OPERATORS = {CONTEXT, ADDITION, SUBTRACTION, MULTIPLICATION, DIVISION, GREATER, LESS, GREATER_OR_EQUAL,
+                    LESS_OR_EQUAL, MAXIMUM, MINIMUM, CONTAINS, OR, AND, NOT}
+RUNTIME_PROPERTIES = {IS_IN_PLAY, INITIATIVE, POSITION, RESOURCES, ALIGNMENT, ACTOR, ATTACK_ATTRIBUTES,
+                      DAMAGE_ATTRIBUTES, ROLL_ATTRIBUTES, 'is_turn', 'match_initiative'}
+STATIC_RESOURCE_PROPERTIES = {INITIAL, MAX_QUANTITY, COMPULSORY, VALUE}
+CHARACTER_SCOPE = 'character'
+ATTRIBUTES_SCOPE = 'attributes'
+ALIGNMENT_SCOPE = 'alignment'
+
+
+class Unvectorizable(Exception):
+    pass
+
+
+# One fitness set per seed, vectorized when NumPy is available and the game allows it
+def get_fitness_sets(match, strategies, seeds):
+    if numpy is not None:
+        try:
+            batch = BatchMatch(match, strategies, seeds)
+        except Unvectorizable as exception:
+            match.log("Falling back to the object engine: " + str(exception))
+            batch = None
+
+        if batch is not None:
+            batch.simulate()
+            return batch.get_fitness_sets()
+
+    fitness_sets = []
+    for seed in seeds:
+        match.reset(strategies=strategies, seed=seed)
+        match.simulate(sink=NullDisplayMessage)
+        fitness_sets.append(match.get_fitness_set())
+    return fitness_sets
+
+
+class Frame:
+    def __init__(self, index, values=None):
+        self.index = index
+        self.values = {} if values is None else values
+
+    def __len__(self):
+        return len(self.index)
+
+    def subset(self, mask):
+        values = {}
+        for slot in self.values:
+            values[slot] = self.values[slot][mask]
+        return Frame(self.index[mask], values)
+
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, frame):
+        return self.value
+
+
+class BatchMatch:
+    def __init__(self, match, strategies, seeds):
+        self.match = match
+        self.strategies = strategies
+        self.characters = match.match_characters
+        self.count = len(seeds)
+        self.random = numpy.random.default_rng(list(seeds))
+        self.slots = itertools.count()
+
+        character_count = len(self.characters)
+        self.resource_definitions = match.environment.resources
+        self.resource_ids = match.environment.resource_ids
+        if contains_key(self.resource_definitions, DIE_ROLL):
+            raise Unvectorizable("resource definitions roll dice")
+        # The definitions are read from the template, so they have to come out the same in every match
+        if not all(is_static(definition.get(key)) for definition in self.resource_definitions.values()
+                   for key in STATIC_RESOURCE_PROPERTIES):
+            raise Unvectorizable("resource definitions read the match's state")
+
+        self.quantities = numpy.zeros((self.count, character_count, len(self.resource_ids)))
+        self.in_play = numpy.ones((self.count, character_count), dtype=bool)
+        self.is_turn = numpy.zeros((self.count, character_count), dtype=bool)
+        self.initiatives = numpy.zeros((self.count, character_count))
+        self.current_initiative = numpy.full(self.count, math.inf)
+        self.members = numpy.zeros((self.count, character_count), dtype=bool)
+        self.turns = numpy.zeros(self.count, dtype=int)
+
+        alignment_names = [character.alignment.name for character in self.characters]
+        self.alignment_masks = [numpy.array([name == alignment_name for name in alignment_names])
+                                for alignment_name in dict.fromkeys(alignment_names)]
+        self.effect_profiles = set(self.characters[0].effect_map) if character_count > 0 else set()
+
+        self.maximum_quantities = numpy.zeros((character_count, len(self.resource_ids)))
+        self.resource_values = numpy.zeros((character_count, len(self.resource_ids)))
+        for index in range(character_count):
+            tables = self.characters[index].resources.tables
+            if not all(is_number(value) for value in tables[VALUE] + tables[MAX_QUANTITY]):
+                raise Unvectorizable("resources of " + self.characters[index].name + " aren't numeric")
+            self.maximum_quantities[index] = tables[MAX_QUANTITY]
+            self.resource_values[index] = tables[VALUE]
+        self.hit_point = self.get_resource_id(HIT_POINT)
+
+        self.initiative_rolls = [self.compile_initiative(index) for index in range(character_count)]
+        self.initializers = [self.compile_hook(index, INITIALIZE, {}) for index in range(character_count)]
+        self.turn_starts = [self.compile_hook(index, START_OF_TURN, {}) for index in range(character_count)]
+        self.tickers = [self.compile_hook(index, TICKER, {}) for index in range(character_count)]
+        self.decisions = [self.compile_decision(index) for index in range(character_count)]
+
+    # Simulation
+
+    def simulate(self):
+        self.start(Frame(numpy.arange(self.count)))
+        ongoing = self.is_ongoing()
+        while ongoing.any():
+            frame = Frame(numpy.nonzero(ongoing)[0])
+            characters = self.get_next_characters(frame)
+            for index in range(len(self.characters)):
+                character_frame = frame.subset(characters == index)
+                if len(character_frame) > 0:
+                    self.decisions[index](character_frame)
+                    self.tick(character_frame)
+            ongoing = self.is_ongoing()
+
+    def start(self, frame):
+        for index in range(len(self.characters)):
+            self.initiatives[frame.index, index] = self.initiative_rolls[index](frame)
+            run(self.initializers[index], frame)
+
+    def is_ongoing(self):
+        alignments_in_play = numpy.zeros(self.count, dtype=int)
+        for alignment_mask in self.alignment_masks:
+            alignments_in_play += self.in_play[:, alignment_mask].any(axis=1)
+        return (alignments_in_play > 1) & (self.turns <= self.match.maximum_turns)
+
+    # Mirrors InitiativeSet.get_next_character: -1 where the initiative changed instead
+    def get_next_characters(self, frame):
+        characters = numpy.full(len(frame), -1)
+        pending = numpy.arange(len(frame))
+        while len(pending) > 0:
+            index = frame.index[pending]
+            members = self.members[index]
+            has_members = members.any(axis=1)
+            head = numpy.argmax(members, axis=1)
+            head_turn = self.is_turn[index, head] & has_members
+
+            characters[pending[head_turn]] = head[head_turn]
+
+            ending = has_members & ~head_turn
+            if ending.any():
+                self.members[index[ending], head[ending]] = False
+                self.trigger_start(index[ending])
+
+            loading = ~has_members
+            if loading.any():
+                self.load_members(index[loading])
+                self.trigger_start(index[loading])
+                self.turns[index[loading]] += 1
+
+            pending = pending[ending]
+        return characters
+
+    def load_members(self, index):
+        initiatives = self.initiatives[index]
+        lower = numpy.where(initiatives < self.current_initiative[index][:, None], initiatives, -math.inf)
+        initiative = lower.max(axis=1)
+        initiative = numpy.where(initiative == -math.inf, initiatives.max(axis=1), initiative)
+        self.current_initiative[index] = initiative
+        self.members[index] = initiatives == initiative[:, None]
+
+    def trigger_start(self, index):
+        # Members out of play are dropped when they reach the head
+        live = self.members[index] & self.in_play[index]
+        has_members = live.any(axis=1)
+        head = numpy.argmax(live, axis=1)
+        self.members[index] &= (numpy.arange(len(self.characters)) >= head[:, None]) & has_members[:, None]
+        for character in range(len(self.characters)):
+            character_index = index[has_members & (head == character)]
+            if len(character_index) > 0:
+                self.is_turn[character_index, character] = True
+                run(self.turn_starts[character], Frame(character_index))
+
+    def tick(self, frame):
+        in_play = self.in_play[frame.index]
+        for index in range(len(self.characters)):
+            run(self.tickers[index], frame.subset(in_play[:, index]))
+
+    def set_quantity(self, index, character, resource, value):
+        kept = numpy.minimum(value, self.maximum_quantities[character, resource]) > 0
+        self.quantities[index, character, resource] = numpy.where(kept, value, 0)
+
+    def get_fitness_sets(self):
+        totals = {}
+        for index in range(len(self.characters)):
+            strategy_name = self.strategies.get_strategy(self.characters[index]).name
+            value = (self.quantities[:, index] * self.resource_values[index]).sum(axis=1)
+            totals[strategy_name] = totals.get(strategy_name, 0) + value
+        return [{strategy_name: totals[strategy_name][match].item() for strategy_name in totals}
+                for match in range(self.count)]
+
+    # Compilation
+
+    def get_slot(self):
+        return next(self.slots)
+
+    def get_resource_id(self, resource_name):
+        if resource_name not in self.resource_ids:
+            raise Unvectorizable("unknown resource " + str(resource_name))
+        return self.resource_ids[resource_name]
+
+    def get_character_index(self, name):
+        for index in range(len(self.characters)):
+            if self.characters[index].name == name:
+                return index
+        raise Unvectorizable("unknown character " + str(name))
+
+    def compile_initiative(self, character):
+        expression = self.characters[character].initiative
+        if expression is None:
+            expression = {DIE_ROLL: get_d20()}
+        return self.compile_value(expression, (CHARACTER_SCOPE, character), {})
+
+    def compile_decision(self, character):
+        if self.strategies.strategy_manager.tie_break is not None:
+            raise Unvectorizable("tie break")
+        match_character = self.characters[character]
+        decision_table = self.strategies.get_strategy(match_character).get_decision_table()
+        skill_conditions = []
+        options = []
+        for skill_name in match_character.match_skills:
+            skill = match_character.match_skills[skill_name]
+            skill_conditions.append(self.compile_conditions(skill.conditions, (CHARACTER_SCOPE, character), {}))
+            targeting = get_targeting(expression=skill.targeting, base=match_character)
+            for target in self.get_targets(targeting, character):
+                target_name = self.characters[target].name
+                nodes = []
+                for key in ((match_character.name, skill.name, target_name), (match_character.name, skill.name, None),
+                            (None, skill.name, target_name), (None, skill.name, None)):
+                    for condition_key, condition, weight in decision_table.get(key, ()):
+                        nodes.append((condition_key, self.compile_meta_condition(condition), weight))
+                act = self.compile_act(skill.trigger, target, character, {})
+                options.append((len(skill_conditions) - 1, target, nodes, act))
+        abstain = self.compile_act({EFFECTS: [{PROFILE: END_TURN}]}, character, character, {})
+
+        def decide(frame):
+            available = [as_mask(condition(frame), frame) for condition in skill_conditions]
+            # Characters out of play are lifted off the board, so they can't be targeted
+            in_play = self.in_play[frame.index]
+            met_conditions = {}
+            weights = numpy.full((len(frame), len(options) + 1), -math.inf)
+            for option_index in range(len(options)):
+                skill_index, target, nodes, act = options[option_index]
+                weight = numpy.zeros(len(frame))
+                for condition_key, condition, node_weight in nodes:
+                    if condition_key not in met_conditions:
+                        met_conditions[condition_key] = condition(frame)
+                    weight += node_weight * met_conditions[condition_key]
+                weights[:, option_index] = numpy.where(available[skill_index] & in_play[:, target], weight,
+                                                       -math.inf)
+
+            # With no action available every weight is -inf, and argmax lands on abstaining
+            weights[:, len(options)] = numpy.where((weights[:, :len(options)] == -math.inf).all(axis=1),
+                                                   0, -math.inf)
+            choices = numpy.argmax(weights, axis=1)
+            for option_index in range(len(options) + 1):
+                option_frame = frame.subset(choices == option_index)
+                if len(option_frame) > 0:
+                    act = abstain if option_index == len(options) else options[option_index][3]
+                    run(act, option_frame)
+
+        return decide
+
+    # Nothing the batch engine plays moves a character, so targets by range are fixed for the whole match,
+    # but for those that leave play
+    def get_targets(self, targeting, character):
+        if type(targeting) is SelfTargeting:
+            return [character]
+        elif type(targeting) is SingleTargeting:
+            return [self.characters.index(target) for target in targeting.get_targets()]
+        else:
+            raise Unvectorizable("targeting " + type(targeting).__name__)
+
+    def compile_meta_condition(self, condition):
+        target = self.get_character_index(condition.target.name)
+        status = getattr(condition.status, 'status', None)
+        value = condition.status.value
+        if status == 'health':
+            return lambda frame: self.quantities[frame.index, target, self.hit_point] > value
+        elif status == 'damage':
+            maximum = self.maximum_quantities[target, self.hit_point]
+            return lambda frame: maximum - self.quantities[frame.index, target, self.hit_point] > value
+        else:
+            raise Unvectorizable("meta status " + str(status))
+
+    # Mirrors Targeting.act with a Trigger built from the definition
+    def compile_act(self, trigger, target, actor, temps):
+        if not is_map(trigger) or trigger.get(CONDITIONS):
+            raise Unvectorizable("trigger conditions")
+        effects = (trigger.get(SUCCESS_EFFECTS) or []) + (trigger.get(EFFECTS) or [])
+        steps = [self.compile_affect(effect, target, actor, temps) for effect in effects]
+        return sequence(steps)
+
+    # Mirrors BasicContext.affect: the actor is a temp attribute of the affected character for the effect
+    def compile_affect(self, effect, target, actor, temps):
+        temps.setdefault(target, {})[ACTOR] = actor
+        profile = effect.get(PROFILE)
+        if profile not in self.effect_profiles:
+            step = None
+        elif profile == ATTACK_EFFECT:
+            step = self.compile_attack(effect, target, actor, temps)
+        elif profile in (CREDIT, DEBIT, SET):
+            step = self.compile_resource_effect(effect, profile, target, temps)
+        elif profile == END_TURN:
+            def step(frame):
+                self.is_turn[frame.index, target] = False
+        elif profile == REMOVE_FROM_PLAY:
+            def step(frame):
+                self.in_play[frame.index, target] = False
+        else:
+            raise Unvectorizable("effect " + str(profile))
+        temps[target].pop(ACTOR, None)
+        return step
+
+    def compile_resource_effect(self, effect, profile, target, temps):
+        holder = temps[target].get(effect.get(TARGET), target)
+        arguments = effect[ARGUMENTS]
+        if not isinstance(holder, int) or not isinstance(arguments[0], str):
+            raise Unvectorizable("resource effect")
+        resource = self.get_resource_id(arguments[0])
+        amount = self.compile_value(arguments[1], (CHARACTER_SCOPE, target), temps)
+
+        def resource_effect(frame):
+            value = amount(frame)
+            if profile == CREDIT:
+                value = self.quantities[frame.index, holder, resource] + value
+            elif profile == DEBIT:
+                value = self.quantities[frame.index, holder, resource] - value
+            self.set_quantity(frame.index, holder, resource, value)
+
+        return resource_effect
+
+    # Mirrors MatchCharacter.attack and MatchCharacter.damage
+    def compile_attack(self, effect, target, actor, temps):
+        scope = (CHARACTER_SCOPE, target)
+        hit_metric = self.compile_value(effect[HIT_METRIC], scope, temps)
+        save_metric = self.compile_value(effect[SAVE_METRIC], scope, temps)
+        hit_slot = self.get_slot()
+        save_slot = self.get_slot()
+        attack_attributes = {
+            TYPE: self.compile_value(effect[TYPE], scope, temps),
+            HIT_METRIC: get_slot_reader(hit_slot),
+            SAVE_METRIC: get_slot_reader(save_slot)
+        }
+        temps[target][ATTACK_ATTRIBUTES] = attack_attributes
+        temps.setdefault(actor, {})[ATTACK_ATTRIBUTES] = attack_attributes
+        attacking = self.compile_hook(actor, ATTACKING, temps)
+        hit_conditions = self.compile_conditions(effect[HIT_CONDITIONS], scope, temps)
+
+        damage = self.compile_value(effect[DAMAGE], scope, temps)
+        damage_slot = self.get_slot()
+        damage_attributes = {
+            TYPE: self.compile_value(effect[TYPE], scope, temps),
+            DAMAGE: get_slot_reader(damage_slot)
+        }
+        temps[target][DAMAGE_ATTRIBUTES] = damage_attributes
+        temps[actor][DAMAGE_ATTRIBUTES] = damage_attributes
+        attacked = self.compile_hook(target, ATTACKED, temps)
+        damage_actor = temps[target].get(ACTOR)
+        if damage_actor is None:
+            raise Unvectorizable("damage without an actor")
+        damage_taken = self.compile_hook(target, DAMAGE_TAKEN, temps)
+        damage_done = self.compile_hook(damage_actor, DAMAGE_DONE, temps)
+        for character in (target, actor):
+            temps[character].pop(DAMAGE_ATTRIBUTES, None)
+            temps[character].pop(ATTACK_ATTRIBUTES, None)
+
+        def attack(frame):
+            frame.values[hit_slot] = as_array(hit_metric(frame), frame)
+            frame.values[save_slot] = as_array(save_metric(frame), frame)
+            run(attacking, frame)
+            hit_frame = frame.subset(as_mask(hit_conditions(frame), frame))
+            if len(hit_frame) == 0:
+                return
+
+            hit_frame.values[damage_slot] = as_array(damage(hit_frame), hit_frame)
+            run(attacked, hit_frame)
+            index = hit_frame.index
+            self.set_quantity(index, target, self.hit_point,
+                              self.quantities[index, target, self.hit_point] - hit_frame.values[damage_slot])
+            run(damage_taken, hit_frame)
+            run(damage_done, hit_frame)
+
+        return attack
+
+    # Mirrors MatchCharacter.trigger_hook
+    def compile_hook(self, character, hook_name, temps):
+        match_character = self.characters[character]
+        if match_character.hook_targeting.get(hook_name) is not None:
+            raise Unvectorizable("hook targeting")
+
+        steps = []
+        for ability in match_character.hook_map[hook_name]:
+            if any(condition is False for condition in ability.conditions):
+                continue
+            elif not self.is_active(ability):
+                # Firing it would still set and clear its character's actor
+                temps.get(character, {}).pop(ACTOR, None)
+                continue
+            conditions = self.compile_conditions(ability.conditions, (CHARACTER_SCOPE, character), temps)
+            steps.append((conditions, self.compile_act(ability.trigger, character, character, temps)))
+
+        if len(steps) == 0:
+            return None
+
+        def hook(frame):
+            for conditions, act in steps:
+                run(act, frame.subset(as_mask(conditions(frame), frame)))
+
+        return hook
+
+    def is_active(self, ability):
+        trigger = ability.trigger if is_map(ability.trigger) else {}
+        effects = (trigger.get(SUCCESS_EFFECTS) or []) + (trigger.get(EFFECTS) or []) + \
+                  (trigger.get(FAILURE_EFFECTS) or [])
+        return any(effect.get(PROFILE) in self.effect_profiles for effect in effects)
+
+    def compile_conditions(self, conditions, scope, temps):
+        if conditions is None:
+            return Constant(False)
+        return self.compile_logical(conditions, scope, temps, numpy.logical_and, False)
+
+    def compile_value(self, expression, scope, temps):
+        if type(expression) is not dict:
+            if is_evaluable(expression):
+                raise Unvectorizable("evaluable context")
+            return Constant(expression)
+
+        if scope[0] == CHARACTER_SCOPE and is_static(expression):
+            return Constant(self.get_static(expression, scope[1]))
+
+        key = get_child_key(expression)
+        value = expression[key]
+        if key == CONTEXT:
+            return self.compile_property(value, scope, temps)
+        elif key in arithmetic_operators:
+            return self.compile_arithmetic(value, scope, temps, arithmetic_operators[key])
+        elif key in comparison_operators:
+            return self.compile_comparison(value, scope, temps, comparison_operators[key])
+        elif key == AND:
+            return self.compile_logical(value[ARGUMENTS], scope, temps, numpy.logical_and, False)
+        elif key == OR:
+            return self.compile_logical(value[ARGUMENTS], scope, temps, numpy.logical_or, True)
+        elif key == NOT:
+            argument = self.compile_value(value[ARGUMENTS], scope, temps)
+            return lambda frame: numpy.logical_not(argument(frame))
+        elif scope[0] == CHARACTER_SCOPE:
+            return self.compile_character_key(key, value, scope[1], temps)
+        elif scope[0] == ALIGNMENT_SCOPE and key == DIE_ROLL:
+            return self.compile_roll(value, scope, temps, None)
+        raise Unvectorizable("operator " + str(key))
+
+    def compile_character_key(self, key, value, character, temps):
+        scope = (CHARACTER_SCOPE, character)
+        character_temps = temps.get(character, {})
+        if key == DIE_ROLL:
+            return self.compile_roll(value, scope, temps, character)
+        elif key == QUANTITY and isinstance(value[VALUE], str):
+            resource = self.get_resource_id(value[VALUE])
+            return lambda frame: self.quantities[frame.index, character, resource]
+        elif key == IS_IN_PLAY:
+            return lambda frame: self.in_play[frame.index, character]
+        elif key == INITIATIVE:
+            return lambda frame: self.initiatives[frame.index, character]
+        elif key == ACTOR and character_temps.get(ACTOR) is not None:
+            return self.compile_value(value, (CHARACTER_SCOPE, character_temps[ACTOR]), temps)
+        elif key in (ATTACK_ATTRIBUTES, DAMAGE_ATTRIBUTES, ROLL_ATTRIBUTES) and key in character_temps:
+            return self.compile_value(value, (ATTRIBUTES_SCOPE, character_temps[key]), temps)
+        elif key == ALIGNMENT:
+            return self.compile_value(value, (ALIGNMENT_SCOPE, character), temps)
+        raise Unvectorizable("character key " + str(key))
+
+    def compile_property(self, expression, scope, temps):
+        key = expression[VALUE]
+        if scope[0] == ATTRIBUTES_SCOPE and key in scope[1]:
+            return scope[1][key]
+        elif scope[0] == CHARACTER_SCOPE and key == IS_IN_PLAY:
+            return lambda frame: self.in_play[frame.index, scope[1]]
+        elif scope[0] == CHARACTER_SCOPE and key in (INITIATIVE, 'match_initiative'):
+            return lambda frame: self.initiatives[frame.index, scope[1]]
+        elif scope[0] == CHARACTER_SCOPE and key == 'is_turn':
+            return lambda frame: self.is_turn[frame.index, scope[1]]
+        elif scope[0] == ALIGNMENT_SCOPE and key == INITIATIVE \
+                and self.characters[scope[1]].alignment.initiative is None:
+            # A character's alignment is re-contexted on every read, so it rolls its own plain d20
+            return self.compile_roll(get_d20(), scope, temps, None)
+        raise Unvectorizable("property " + str(key))
+
+    # Rolls by a character fire its roll hook, with the roll as a temp attribute
+    def compile_roll(self, expression, scope, temps, character):
+        count = self.compile_value(expression[DIE_COUNT], scope, temps)
+        sides = self.compile_value(expression[DIE_SIDES], scope, temps)
+        if not isinstance(count, Constant) or not isinstance(sides, Constant) or count.value < 1:
+            raise Unvectorizable("dice")
+        die_count = count.value
+        die_sides = sides.value
+
+        hook = None
+        roll_slot = self.get_slot()
+        if character is not None:
+            character_temps = temps.setdefault(character, {})
+            character_temps[ROLL_ATTRIBUTES] = {CURRENT_ROLL: get_slot_reader(roll_slot)}
+            hook = self.compile_hook(character, ROLL, temps)
+            character_temps.pop(ROLL_ATTRIBUTES, None)
+
+        def roll(frame):
+            rolls = self.roll_dice(die_count, die_sides, len(frame))
+            if hook is not None:
+                frame.values[roll_slot] = rolls
+                hook(frame)
+            return rolls
+
+        return roll
+
+    # Mirrors Die.roll, summing every die
+    def roll_dice(self, die_count, die_sides, size):
+        if die_count == 1:
+            return self.random.integers(1, die_sides + 1, size=size)
+        return self.random.integers(1, die_sides + 1, size=(size, die_count)).sum(axis=1)
+
+    def compile_arithmetic(self, expression, scope, temps, operator_function):
+        arguments = [self.compile_value(argument, scope, temps) for argument in expression[ARGUMENTS]]
+
+        def arithmetic(frame):
+            value = arguments[0](frame)
+            for argument in arguments[1:]:
+                value = operator_function(value, argument(frame))
+            return value
+
+        return fold(arithmetic, arguments)
+
+    def compile_comparison(self, expression, scope, temps, operator_function):
+        first, *arguments = [self.compile_value(argument, scope, temps) for argument in expression[ARGUMENTS]]
+
+        def comparison(frame):
+            value = first(frame)
+            result = True
+            for argument in arguments:
+                result = numpy.logical_and(result, operator_function(value, argument(frame)))
+            return result
+
+        return fold(comparison, [first] + arguments)
+
+    # Arguments after one that is constantly decisive are never evaluated, like the object engine's and/or
+    def compile_logical(self, expressions, scope, temps, operator_function, decisive):
+        arguments = []
+        for expression in expressions:
+            argument = self.compile_value(expression, scope, temps)
+            if isinstance(argument, Constant) and bool(argument.value) == decisive:
+                return Constant(decisive)
+            if not isinstance(argument, Constant):
+                arguments.append(argument)
+
+        if len(arguments) == 0:
+            return Constant(not decisive)
+
+        def logical(frame):
+            result = not decisive
+            for argument in arguments:
+                result = operator_function(result, argument(frame))
+            return result
+
+        return logical
+
+    def get_static(self, expression, character):
+        value = self.characters[character].eval(expression)
+        if not is_number(value) and not isinstance(value, str) \
+                and not (is_list(value) and all(isinstance(item, str) for item in value)):
+            raise Unvectorizable("static value " + str(value))
+        return value
+
+
+arithmetic_operators = {
+    ADDITION: operator.add,
+    SUBTRACTION: operator.sub,
+    MULTIPLICATION: operator.mul,
+    DIVISION: operator.truediv,
+    MAXIMUM: lambda a, b: numpy.maximum(a, b),
+    MINIMUM: lambda a, b: numpy.minimum(a, b)
+}
+
+comparison_operators = {
+    GREATER: operator.gt,
+    LESS: operator.lt,
+    GREATER_OR_EQUAL: operator.ge,
+    LESS_OR_EQUAL: operator.le
+}
+
+
+# Expressions over a character's fixed properties are evaluated once, by the object engine
+def is_static(expression):
+    if is_list(expression):
+        return all(is_static(item) for item in expression)
+    elif type(expression) is not dict:
+        return not is_evaluable(expression)
+
+    for key in expression:
+        value = expression[key]
+        if key == RESOURCES:
+            if not is_static_resource_lookup(value):
+                return False
+        elif key not in STATIC_OPERATORS:
+            return False
+        elif key == CONTEXT:
+            if not is_map(value) or value.get(VALUE) in RUNTIME_PROPERTIES or not is_static(value.get(VALUE)):
+                return False
+        elif not is_static(value):
+            return False
+    return True
+
+
+# Only a resource's definition is fixed; its quantity, read through the resource set, changes as the match runs
+def is_static_resource_lookup(expression):
+    for resource_name in expression:
+        lookup = expression[resource_name]
+        if not is_map(lookup) or not is_map(lookup.get(CONTEXT)) \
+                or lookup[CONTEXT].get(VALUE) not in STATIC_RESOURCE_PROPERTIES:
+            return False
+    return True
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def fold(function, arguments):
+    if all(isinstance(argument, Constant) for argument in arguments):
+        return Constant(function(None))
+    return function
+
+
+def get_slot_reader(slot):
+    return lambda frame: frame.values[slot]
+
+
+def sequence(steps):
+    steps = [step for step in steps if step is not None]
+
+    def run_steps(frame):
+        for step in steps:
+            step(frame)
+
+    return run_steps
+
+
+def run(step, frame):
+    if step is not None and len(frame) > 0:
+        step(frame)
+
+
+def as_array(value, frame):
+    return numpy.broadcast_to(numpy.asarray(value, dtype=float), (len(frame),)).copy()
+
+
+def as_mask(value, frame):
+    return numpy.broadcast_to(numpy.asarray(value, dtype=bool), (len(frame),))
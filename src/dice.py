@@ -0,0 +1,345 @@
+from match import *
+
+
+# Dice
+#
+# Exact distributions of what an expression evaluates to, for expressions whose only randomness
+# is their dice. A Distribution maps each value to its probability; NdS + k distributions are
+# computed once and cached. The parts of an expression without dice are evaluated by the object
+# engine itself, with the match's die swapped for one that refuses to roll, so an analysis never
+# draws from a match's dice stream. Anything else raises Unanalyzable, and callers fall back on
+# playing the match out.
+
+class Unanalyzable(Exception):
+    pass
+
+
+class Distribution:
+    def __init__(self, masses, dice=None):
+        self.masses = masses
+        # (count, sides, modifier) when this is exactly NdS + k
+        self.dice = dice
+
+    def get_mean(self):
+        return sum(value * mass for value, mass in self.masses.items())
+
+    def get_probability(self, value):
+        return self.masses.get(value, 0)
+
+    # The probability that the value is truthy, the way and, or and not take it
+    def get_truth(self):
+        return sum(mass for value, mass in self.masses.items() if value)
+
+    def is_certain(self):
+        return len(self.masses) == 1
+
+    def get_value(self):
+        return next(iter(self.masses))
+
+    # The distribution of function(a, b) for a drawn from this and b drawn independently from other
+    def combine(self, other, function):
+        masses = {}
+        for value, mass in self.masses.items():
+            for other_value, other_mass in other.masses.items():
+                result = function(value, other_value)
+                masses[result] = masses.get(result, 0) + mass * other_mass
+        return Distribution(masses)
+
+    def __str__(self):
+        return ', '.join(str(value) + ': ' + str(self.masses[value]) for value in sorted(self.masses))
+
+
+# Hit probability and damage of one attack effect. The damage distribution is the damage done
+# given a hit, so the expected damage of the attack is the hit probability times its mean
+class AttackAnalysis:
+    def __init__(self, hit_probability, damage):
+        self.hit_probability = hit_probability
+        self.damage = damage
+
+    def get_expected_damage(self):
+        if self.hit_probability == 0:
+            return 0
+        return self.hit_probability * self.damage.get_mean()
+
+    def __str__(self):
+        return ('hits with probability ' + str(self.hit_probability)
+                + ' for an expected ' + str(self.get_expected_damage()) + ' damage')
+
+
+# Stands in for a match's die while analysing; rolling means part of the expression wasn't analyzable
+class AnalysisDie(Die):
+    def roll(self, die_count, sides):
+        raise Unanalyzable("dice outside of an analyzable expression")
+
+
+analysis_die = AnalysisDie()
+dice_distributions = {}
+key_searches = {}
+
+
+# NdS + k, counted in outcomes so the cached probabilities are exact ratios
+def get_dice_distribution(die_count, die_sides, modifier=0):
+    key = (die_count, die_sides, modifier)
+    distribution = dice_distributions.get(key)
+    if distribution is None:
+        if modifier != 0:
+            masses = get_dice_distribution(die_count, die_sides).masses
+            distribution = Distribution({total + modifier: masses[total] for total in masses}, key)
+        else:
+            counts = {0: 1}
+            for i in range(die_count):
+                next_counts = {}
+                for total in counts:
+                    for side in range(1, die_sides + 1):
+                        next_counts[total + side] = next_counts.get(total + side, 0) + counts[total]
+                counts = next_counts
+            outcomes = die_sides ** die_count
+            distribution = Distribution({total: counts[total] / outcomes for total in counts}, key)
+        dice_distributions[key] = distribution
+    return distribution
+
+
+def get_certain(value):
+    if not isinstance(value, (int, float, str)):
+        raise Unanalyzable("value " + str(value))
+    return Distribution({value: 1})
+
+
+# Expected damage of everything an action's attacks do to its target, or None if any of them isn't analyzable
+def get_expected_damage(action):
+    try:
+        return sum(analysis.get_expected_damage() for analysis in analyze_action(action))
+    except Unanalyzable:
+        return None
+
+
+# Expected damage of every attacking skill of each character in play against each of the others its skill's
+# targeting could pick, wherever they stand and whatever the skill costs, keyed by the names of the actor,
+# skill and target; None for those that aren't analyzable. Characters of the same name share an entry
+def get_expected_damages(match):
+    damages = {}
+    characters = match.get_characters_in_play()
+    for character in characters:
+        for skill_name in character.match_skills:
+            skill = character.match_skills[skill_name]
+            trigger = Trigger(skill.get(TRIGGER))
+            effects = trigger.success_effects + trigger.failure_effects + trigger.effects
+            if not any(effect.get(PROFILE) == ATTACK_EFFECT for effect in effects):
+                continue
+            targeting = skill.get_targeting(character)
+            for target in characters:
+                if target is not character and is_affine(character, target, targeting.get(AFFINITY)):
+                    action = MatchAction(character, skill, target, targeting, base=skill)
+                    damages[(character.name, skill_name, target.name)] = get_expected_damage(action)
+    return damages
+
+
+# Expected damage as get_expected_damage works it out, kept on the action until the resource quantities,
+# properties, temps or positions of its actor or target change
+def get_action_damage(action):
+    inputs = get_analysis_inputs(action.actor) + get_analysis_inputs(action.target)
+    if inputs != action.damage_inputs:
+        action.damage_inputs = inputs
+        action.expected_damage = get_expected_damage(action)
+    return action.expected_damage
+
+
+# A target that isn't a character, like the tile a move targets, only has its properties and temps
+def get_analysis_inputs(context):
+    inputs = (context.revision, tuple(context.temp_atr.items()))
+    if isinstance(context, MatchCharacter):
+        inputs += (tuple(context.resources.quantities), context.position.x, context.position.y)
+    return inputs
+
+
+# One analysis per attack the action would make, as things stand in its match
+def analyze_action(action):
+    trigger = Trigger(action.trigger)
+    effects = trigger.success_effects + trigger.failure_effects + trigger.effects
+    if not any(effect.get(PROFILE) == ATTACK_EFFECT for effect in effects):
+        return []
+    if type(action.targeting).act is not Targeting.act:
+        raise Unanalyzable("targeting " + type(action.targeting).__name__)
+
+    with AnalysisScope(action.target.get_match()):
+        # Mirrors Targeting.act, whose trigger conditions have no dice to be analyzable
+        if action.target.re_context(trigger).check_conditions():
+            effects = trigger.success_effects + trigger.effects
+        else:
+            effects = trigger.failure_effects + trigger.effects
+        return [analyze_attack(effect, action.target, action.actor)
+                for effect in effects if effect.get(PROFILE) == ATTACK_EFFECT]
+
+
+# Mirrors MatchCharacter.attack: the hit conditions are checked against every pair of hit and save metrics
+# they could be given, and the damage is rolled for each pair that hits
+def analyze_attack(effect, target, actor):
+    target_temps = dict(target.temp_atr)
+    actor_temps = dict(actor.temp_atr)
+    with AnalysisScope(target.get_match()):
+        target.set_temp(ACTOR, actor)
+        try:
+            return get_attack_analysis(effect, target, actor)
+        finally:
+            target.temp_atr = target_temps
+            actor.temp_atr = actor_temps
+
+
+def get_attack_analysis(effect, target, actor):
+    if has_key(effect[HIT_CONDITIONS], DIE_ROLL):
+        raise Unanalyzable("hit conditions roll dice")
+    for character, hook_name in ((actor, ATTACKING), (target, ATTACKED)):
+        if has_active_subscriptions(character, hook_name):
+            raise Unanalyzable(hook_name + " hook of " + character.name)
+
+    attack_type = target.eval(effect[TYPE])
+    hit_metric = get_distribution(target, effect[HIT_METRIC])
+    save_metric = get_distribution(target, effect[SAVE_METRIC])
+    # Damage that doesn't read the attack attributes is the same whichever pair hit
+    damage = None
+    if not has_key(effect[DAMAGE], ATTACK_ATTRIBUTES):
+        damage = get_distribution(target, effect[DAMAGE])
+
+    hit_probability = 0
+    damage_masses = {}
+    for hit_value, hit_mass in hit_metric.masses.items():
+        for save_value, save_mass in save_metric.masses.items():
+            attack_attributes = TempAttributes({TYPE: attack_type, HIT_METRIC: hit_value, SAVE_METRIC: save_value})
+            target.set_temp(ATTACK_ATTRIBUTES, attack_attributes)
+            actor.set_temp(ATTACK_ATTRIBUTES, attack_attributes)
+            if target.check_conditions(effect[HIT_CONDITIONS]):
+                mass = hit_mass * save_mass
+                hit_probability += mass
+                pair_damage = damage if damage is not None else get_distribution(target, effect[DAMAGE])
+                for value, damage_mass in pair_damage.masses.items():
+                    damage_masses[value] = damage_masses.get(value, 0) + mass * damage_mass
+
+    if hit_probability > 0:
+        damage_masses = {value: damage_masses[value] / hit_probability for value in damage_masses}
+    return AttackAnalysis(hit_probability, Distribution(damage_masses))
+
+
+def get_distribution(context, expression):
+    if type(expression) is not dict or not has_key(expression, DIE_ROLL):
+        return get_certain(context.eval(expression))
+
+    key = get_child_key(expression)
+    value = expression[key]
+    if key == DIE_ROLL:
+        return get_roll_distribution(context, value)
+    elif key in arithmetic_functions:
+        return get_arithmetic_distribution(context, value[ARGUMENTS], key)
+    elif key in comparison_functions:
+        return get_comparison_distribution(context, value[ARGUMENTS], comparison_functions[key])
+    elif key in (AND, OR):
+        arguments = [get_distribution(context, argument) for argument in value[ARGUMENTS]]
+        probabilities = [argument.get_truth() for argument in arguments]
+        if key == AND:
+            probability = math.prod(probabilities)
+        else:
+            probability = 1 - math.prod(1 - probability for probability in probabilities)
+        return Distribution({True: probability, False: 1 - probability})
+    elif key == NOT:
+        probability = get_distribution(context, value[ARGUMENTS]).get_truth()
+        return Distribution({True: 1 - probability, False: probability})
+    elif key not in context.function_map and key not in compiler_map:
+        # Mirrors compile_dynamic, which evaluates the rest of the expression in the context found under the key
+        scope = context.get(key)
+        if is_context(scope):
+            return get_distribution(scope, value)
+    raise Unanalyzable("operator " + str(key))
+
+
+# Mirrors MatchCharacter.roll, whose roll hook could change the roll
+def get_roll_distribution(context, expression):
+    die_count = get_distribution(context, expression[DIE_COUNT])
+    die_sides = get_distribution(context, expression[DIE_SIDES])
+    if not die_count.is_certain() or not die_sides.is_certain() or die_count.get_value() < 1:
+        raise Unanalyzable("dice")
+    if isinstance(context, MatchCharacter) and has_active_subscriptions(context, ROLL):
+        raise Unanalyzable("roll hook of " + context.name)
+    return get_dice_distribution(die_count.get_value(), die_sides.get_value())
+
+
+# A dice distribution plus constants is looked up as NdS + k rather than convolved
+def get_arithmetic_distribution(context, expressions, key):
+    function = arithmetic_functions[key]
+    arguments = [get_distribution(context, argument) for argument in expressions]
+    if key == ADDITION:
+        constant = sum(argument.get_value() for argument in arguments if argument.is_certain())
+        dice = [argument for argument in arguments if not argument.is_certain()]
+        if len(dice) == 1 and dice[0].dice is not None:
+            count, sides, modifier = dice[0].dice
+            return get_dice_distribution(count, sides, modifier + constant)
+        # The object engine adds to 0
+        arguments = [get_certain(0)] + arguments
+
+    distribution = arguments[0]
+    for argument in arguments[1:]:
+        distribution = distribution.combine(argument, function)
+    return distribution
+
+
+# Chained comparisons compare the first argument with each of the others, so they share its value
+def get_comparison_distribution(context, expressions, function):
+    first, *arguments = [get_distribution(context, argument) for argument in expressions]
+    probability = 0
+    for value, mass in first.masses.items():
+        for argument in arguments:
+            mass *= sum(argument_mass for argument_value, argument_mass in argument.masses.items()
+                        if function(value, argument_value))
+        probability += mass
+    return Distribution({True: probability, False: 1 - probability})
+
+
+# Mirrors MatchCharacter.trigger_hook; a subscription only matters if its trigger has an effect its character can do
+def has_active_subscriptions(character, hook_name):
+    for subscription in character.subscriptions.get(hook_name, ()):
+        trigger = subscription.trigger
+        effects = trigger.success_effects + trigger.failure_effects + trigger.effects
+        if any(effect.get(PROFILE) in character.effect_map for effect in effects):
+            return True
+    return False
+
+
+# Which keys an expression contains never changes, so it is worked out once per expression
+def has_key(expression, key):
+    entry = key_searches.get((id(expression), key))
+    if entry is None or entry[0] is not expression:
+        entry = (expression, contains_key(expression, key))
+        if len(key_searches) >= COMPILE_CACHE_LIMIT:
+            key_searches.clear()
+        key_searches[(id(expression), key)] = entry
+    return entry[1]
+
+
+# Swaps the match's die for the analysis die for as long as an analysis runs
+class AnalysisScope:
+    def __init__(self, match):
+        self.match = match
+        self.die = None
+
+    def __enter__(self):
+        self.die = self.match.die
+        self.match.die = analysis_die
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.match.die = self.die
+
+
+arithmetic_functions = {
+    ADDITION: operator.add,
+    SUBTRACTION: operator.sub,
+    MULTIPLICATION: operator.mul,
+    DIVISION: operator.truediv,
+    MAXIMUM: max,
+    MINIMUM: min
+}
+
+comparison_functions = {
+    GREATER: operator.gt,
+    LESS: operator.lt,
+    GREATER_OR_EQUAL: operator.ge,
+    LESS_OR_EQUAL: operator.le
+}
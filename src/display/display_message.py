@@ -2,6 +2,8 @@ from model.prompts import *
 
 
 class DisplayMessage:
+    active = True
+
     def __init__(self, display=None):
         self.display = display
         self.display_message = ""
@@ -33,3 +35,26 @@ class DisplayMessage:
     def input(self):
         if self.display is not None:
             self.display.input(self.display_message)
+
+
+# Headless sink: drops everything, and callers skip building strings for it altogether
+class NullDisplayMessage(DisplayMessage):
+    active = False
+
+    def add_section(self, string, level=0):
+        pass
+
+    def add_text(self, string):
+        pass
+
+    def add_raw(self, raw):
+        pass
+
+    def add_divider(self, level=0):
+        pass
+
+    def print(self):
+        pass
+
+    def input(self):
+        pass
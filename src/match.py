@@ -1,6 +1,9 @@
+import heapq
 import math
+import operator
+from collections import deque
 
-from display.display_message import DisplayMessage
+from display.display_message import DisplayMessage, NullDisplayMessage
 from model.json_def import *
 from model.prompts import *
 from basic.basics import *
@@ -8,7 +11,13 @@ from basic.basics import *
 
 # Match
 
+# Board distances are in feet, a square to every five, and diagonal steps cost the same as straight ones
+SQUARE_FEET = 5
+BOARD_BUCKET_SIZE = 8
+
 class InitiativeContext(BasicContext):
+    function_names = {INITIATIVE: 'get_initiative'}
+
     def get_initiative(self, expression=None, display_message=None):
         if expression is None:
             expression = self.initiative
@@ -29,36 +38,77 @@ class InitiativeContext(BasicContext):
 
 
 class MatchContext(BasicContext):
-    def __init__(self, maximum_turns, properties=None, strategies=None, display_message=None):
+    # A seed makes the match's dice reproducible; every context in the match rolls with this one stream
+    def __init__(self, maximum_turns, properties=None, strategies=None, display_message=None, seed=None):
         self.maximum_turns = maximum_turns
         self.board = Board(properties[BOARD_WIDTH], properties[BOARD_HEIGHT])
         self.alignments = []
         self.match_characters = []
+        # In-play characters per alignment name, and the in-play characters in creation order when known
+        self.alignment_counts = {}
+        self.characters_in_play = None
         self.initiative_set = InitiativeSet()
         self.action_set_stack = []
         self.strategies = strategies
+        self.subscribers = {}
+        # What simulate was asked to report damage to, and the action being played when it was done
+        self.observer = None
+        self.current_action = None
         super().__init__(properties, base=self.environment)
+        self.die = Die(seed)
         for definition_name in properties[GAME_CHARACTERS]:
             characters = create_contexts(self.environment.characters[definition_name], MatchCharacter, base=self)
             for character in characters:
                 character.set_match(self)
                 self.match_characters.append(character)
-                self.initiative_set.add_character(character)
+                self.board.place(character)
                 if character.alignment not in self.alignments:
                     self.alignments.append(character.alignment)
-                character.trigger_hook(INITIALIZE, display_message=display_message)
+                for hook_name in character.subscriptions:
+                    self.subscribers.setdefault(hook_name, []).append(character)
 
         self.set_match(self)
+        self.snapshots = [character.get_snapshot() for character in self.match_characters]
+        self.count_in_play()
+        self.start(display_message=display_message)
+
+    # Evaluates the characters' resource definitions, then rolls initiative and initializes the characters,
+    # in the order the characters were created
+    def start(self, display_message=None):
+        for character in self.match_characters:
+            character.resources.evaluate()
+        for character in self.match_characters:
+            self.initiative_set.add_character(character)
+            character.trigger_hook(INITIALIZE, display_message=display_message)
+
+    # Puts the characters back the way they were created and starts over, so one match
+    # can serve as a template for many; reset(seed=s) plays out exactly like a new match seeded with s
+    def reset(self, strategies=None, seed=None, display_message=None):
+        if strategies is not None:
+            self.strategies = strategies
+        self.die.seed(seed)
+        self.initiative_set = InitiativeSet()
+        self.action_set_stack = []
+        for character, snapshot in zip(self.match_characters, self.snapshots):
+            character.restore(snapshot)
+            self.board.place(character)
+        self.count_in_play()
+        self.start(display_message=display_message)
 
     def get_turn(self):
         return self.initiative_set.turn
 
-    def simulate(self, display=None):
+    # sink is the DisplayMessage type to report through; NullDisplayMessage runs headless.
+    # An observer is told of every bit of damage done, through add_damage(action, actor, target, damage)
+    def simulate(self, display=None, sink=DisplayMessage, observer=None):
+        self.observer = observer
         while self.is_ongoing():
-            display_message = DisplayMessage(display)
-            display_message.add_text("Characters:")
-            for character in [character for character in self.match_characters if character.is_in_play()]:
-                display_message.add_text(str(character))
+            display_message = sink(display)
+            displayed = display_message.active
+            if displayed:
+                display_message.add_text("Characters:")
+                for character in self.get_characters_in_play():
+                    display_message.add_text(str(character))
 
             if len(self.action_set_stack) > 0:
                 current_character = self.initiative_set.get_current_character()
@@ -67,43 +117,70 @@ class MatchContext(BasicContext):
                 actions = self.action_set_stack.pop()
                 strategy = self.strategies.get_strategy(current_character)
 
-                display_message.add_section("Current Character: " + str(current_character))
-                display_message.add_text("Current Initiative: " + str(initiative))
-                display_message.add_text("Current Turn: " + str(turn))
-                display_message.add_section("Strategy: " + strategy.name, level=2)
-                # TODO: see note on 5ebb.report_strategies... shame on you
-                # for node in strategy.nodes:
-                #     display_message.add_text(str(node))
-                display_message.add_section("Possible actions: ", level=1)
-                for action in actions:
-                    display_message.add_text(str(action))
+                if displayed:
+                    display_message.add_section("Current Character: " + str(current_character))
+                    display_message.add_text("Current Initiative: " + str(initiative))
+                    display_message.add_text("Current Turn: " + str(turn))
+                    display_message.add_section("Strategy: " + strategy.name, level=2)
+                    # TODO: see note on 5ebb.report_strategies... shame on you
+                    # for node in strategy.nodes:
+                    #     display_message.add_text(str(node))
+                    display_message.add_section("Possible actions: ", level=1)
+                    for action in actions:
+                        display_message.add_text(str(action))
 
                 action = strategy.choose_action(self, actions)
-                display_message.add_section("Action chosen: " + str(action))
+                if displayed:
+                    display_message.add_section("Action chosen: " + str(action))
 
+                self.current_action = action
                 action.activate(display_message)
-                for character in [character for character in self.match_characters if character.is_in_play()]:
+                self.current_action = None
+                for character in self.get_subscribers_in_play(TICKER):
                     character.trigger_hook(TICKER)
 
                 display_message.input()
             else:
                 character = self.initiative_set.get_next_character()
                 if character is not None:
-                    display_message.add_section("Current Turn: " + str(character))
+                    if displayed:
+                        display_message.add_section("Current Turn: " + str(character))
                     self.action_set_stack.append(character.get_actions())
+        self.observer = None
 
     def is_ongoing(self):
         return (self.is_conflict()) and (self.get_turn() <= self.maximum_turns)
 
     def is_conflict(self):
-        alignments = []
+        return len(self.alignment_counts) > 1
+
+    def count_in_play(self):
+        self.alignment_counts = {}
         for character in self.match_characters:
-            alignment = character.alignment
-            if character.is_in_play() and alignment not in alignments:
-                alignments.append(alignment)
-                if len(alignments) > 1:
-                    return True
-        return False
+            if character.is_in_play():
+                alignment_name = character.alignment.name
+                self.alignment_counts[alignment_name] = self.alignment_counts.get(alignment_name, 0) + 1
+        self.characters_in_play = None
+
+    # Called by a character whose in_play flag changed
+    def update_in_play(self, character, in_play):
+        alignment_name = character.alignment.name
+        count = self.alignment_counts.get(alignment_name, 0) + (1 if in_play else -1)
+        if count > 0:
+            self.alignment_counts[alignment_name] = count
+        else:
+            self.alignment_counts.pop(alignment_name, None)
+        self.characters_in_play = None
+
+    # The list is replaced rather than changed, so it is safe to loop over while characters leave play
+    def get_characters_in_play(self):
+        if self.characters_in_play is None:
+            self.characters_in_play = [character for character in self.match_characters if character.is_in_play()]
+        return self.characters_in_play
+
+    # The in-play characters with abilities on the hook, in creation order
+    def get_subscribers_in_play(self, hook_name):
+        return [character for character in self.subscribers.get(hook_name, ()) if character.is_in_play()]
 
     def get_fitness_set(self):
         fitness_set = {}
@@ -124,6 +201,8 @@ class MatchContext(BasicContext):
             return super().__str__()
 
 
+# Initiatives still to come this round sit in a heap, refilled with every initiative when the round ends.
+# Each turn loads the characters at the next initiative; those out of play are skipped when reached.
 class InitiativeSet(BasicContext):
     def __init__(self, properties=None, name='', base=None):
         self.characters = []
@@ -131,43 +210,37 @@ class InitiativeSet(BasicContext):
         self.turn = 0
         self.initiatives = []
         self.current_initiative = math.inf
-        self.current_characters = []
+        self.current_characters = deque()
         super().__init__(properties, name, base)
 
     # Returns None upon a change in initiative
     def get_next_character(self):
-        character = None
-
-        if len(self.current_characters) > 0:
+        while len(self.current_characters) > 0:
             character = self.current_characters[0]
-            if not character.is_turn:
-                self.current_characters.pop()
-                self.trigger_start()
-                character = self.get_next_character()
-        else:
-            self.load_current_characters()
+            if character.is_turn:
+                return character
+            self.current_characters.popleft()
             self.trigger_start()
-            self.turn += 1
 
-        return character
+        self.load_current_characters()
+        self.trigger_start()
+        self.turn += 1
+        return None
 
     def trigger_start(self):
+        while len(self.current_characters) > 0 and not self.current_characters[0].is_in_play():
+            self.current_characters.popleft()
         if len(self.current_characters) > 0:
             character = self.current_characters[0]
             character.is_turn = True
             character.trigger_hook(START_OF_TURN)
 
     def load_current_characters(self):
-        i = 0
-        initiative = self.initiatives[i]
-        while self.current_initiative <= initiative:
-            i += 1
-            if i >= len(self.initiatives):
-                initiative = self.initiatives[0]
-                break
-            initiative = self.initiatives[i]
-        self.current_initiative = initiative
-        self.current_characters = [character for character in self.turn_order[initiative] if character.is_in_play()]
+        if len(self.initiatives) == 0:
+            self.initiatives = [-initiative for initiative in self.turn_order]
+            heapq.heapify(self.initiatives)
+        self.current_initiative = -heapq.heappop(self.initiatives)
+        self.current_characters = deque(self.turn_order[self.current_initiative])
 
     def get_current_character(self):
         character = None
@@ -175,21 +248,34 @@ class InitiativeSet(BasicContext):
             character = self.current_characters[0]
         return character
 
+    # A character joining mid-round acts this round if its initiative is still to come
     def add_character(self, character):
         initiative = character.get_initiative()
         turns = self.turn_order.get(initiative)
         if turns is None:
             turns = [character]
             self.turn_order[initiative] = turns
-            self.initiatives.append(initiative)
+            if initiative < self.current_initiative:
+                heapq.heappush(self.initiatives, -initiative)
         else:
             turns.append(character)
 
         self.characters.append(character)
-        self.initiatives.sort(reverse=True)
 
 
 class MatchCharacter(InitiativeContext):
+    function_names = {QUANTITY: 'get_quantity', IS_IN_PLAY: 'is_in_play'}
+    effect_names = {
+        ATTACK_EFFECT: 'attack',
+        DAMAGE_EFFECT: 'damage',
+        CREDIT: 'credit_effect',
+        DEBIT: 'debit_effect',
+        SET: 'set_effect',
+        END_TURN: 'end_turn',
+        REMOVAL_FROM_PLAY: 'remove_from_play',
+        MOVEMENT_EFFECT: 'move'
+    }
+
     def __init__(self, properties=None, name='', base=None):
         if name == '':
             name = properties[NAME]
@@ -204,68 +290,87 @@ class MatchCharacter(InitiativeContext):
         self.match_skills = {}
         self.hook_map = {}
         self.hook_targeting = {}
+        self.subscriptions = {}
+        self.abstain_action = None
         self.in_play = True
         self.is_turn = False
         super().__init__(properties, name, base)
 
         self.alignment = MatchAlignment(name=properties[ALIGNMENT])
-        self.resources = MatchResourceSet(character=self)
-        self.effect_map[ATTACK_EFFECT] = self.attack
-        self.effect_map[DAMAGE_EFFECT] = self.damage
-        self.effect_map[CREDIT] = self.credit_effect
-        self.effect_map[DEBIT] = self.debit_effect
-        self.effect_map[SET] = self.set_effect
-        self.effect_map[END_TURN] = self.end_turn
-        self.effect_map[REMOVAL_FROM_PLAY] = self.remove_from_play
 
         hook_names = [INITIALIZE, ROLL, START_OF_TURN, END_OF_TURN, MOVEMENT, THREATENED_ZONE_ENTRANCE,
                       THREATENED_ZONE_EXIT, ATTACKING, ATTACKED, DAMAGE_DONE, DAMAGE_TAKEN, REMOVAL_FROM_PLAY, TICKER]
         for hook_name in hook_names:
             self.hook_map[hook_name] = []
 
-        self.function_map[INITIATIVE] = self.get_initiative
-        self.function_map[QUANTITY] = self.get_quantity
-        self.function_map[IS_IN_PLAY] = self.is_in_play
         skills = [self.environment.skills[skill_name] for skill_name in self.skills]
         abilities = [self.environment.abilities[ability_name] for ability_name in self.abilities]
         for skill in create_contexts(skills, MatchSkill, base=self):
             self.match_skills[skill.name] = skill
         for ability in create_contexts(abilities, MatchAbility, base=self):
             self.hook_map[ability.hook[PROFILE]].append(ability)
+        for hook_name in hook_names:
+            if len(self.hook_map[hook_name]) > 0:
+                targeting = get_targeting(self.hook_targeting.get(hook_name), base=self)
+                self.subscriptions[hook_name] = [Subscription(ability, targeting)
+                                                 for ability in self.hook_map[hook_name]]
+        self.resources = MatchResourceSet(character=self)
 
         x = properties[POSITION][0]
         y = properties[POSITION][1]
         self.set(POSITION, Position(x, y))
 
-    def trigger_hook(self, hook_name, display_message=None):
-        for ability in self.hook_map[hook_name]:
-            if self.check_conditions(ability.conditions, display_message=display_message):
-                if display_message is not None:
-                    display_message.add_section(self.get(NAME) + " triggered ability " + ability.get(NAME), level=2)
-                targeting = get_targeting(self.hook_targeting.get(hook_name), base=self)
-                targets = targeting.get_targets()
-                target = None
-                if len(targets) > 0:
-                    target = targets[0]
-                targeting.act(target, Trigger(ability.trigger), self, display_message=display_message)
+    # A hook without subscriptions is skipped outright.
+    # A target, such as the character moving through a threatened zone, overrides the hook's targeting
+    def trigger_hook(self, hook_name, display_message=None, target=None):
+        subscriptions = self.subscriptions.get(hook_name)
+        if subscriptions is None:
+            return
+        for subscription in subscriptions:
+            if subscription.check_conditions(self, display_message=display_message):
+                if is_displayed(display_message):
+                    display_message.add_section(self.get(NAME) + " triggered ability "
+                                                + subscription.ability.get(NAME), level=2)
+                ability_target = target
+                if ability_target is None:
+                    targets = subscription.targeting.get_targets()
+                    if len(targets) > 0:
+                        ability_target = targets[0]
+                subscription.targeting.act(ability_target, subscription.trigger, self, display_message=display_message)
 
     def get_actions(self):
         actions = []
 
         for skill_name in self.match_skills:
             skill = self.match_skills[skill_name]
-            if self.check_conditions(skill.conditions):
-                targeting = get_targeting(expression=skill[TARGETING], base=self)
-                actions += targeting.get_actions(skill)
+            if skill.is_available(self):
+                actions += skill.get_targeting(self).get_actions(skill)
 
         if len(actions) == 0:
-            actions.append(get_abstain_action(self))
+            if self.abstain_action is None:
+                self.abstain_action = get_abstain_action(self)
+            actions.append(self.abstain_action)
 
         return actions
 
     def get_hp(self):
         return self.resources.get(HIT_POINT)
 
+    # The state a match changes: resources, position, flags and initiative
+    def get_snapshot(self):
+        return self.resources.get_quantities(), self.position.x, self.position.y
+
+    def restore(self, snapshot):
+        quantities, x, y = snapshot
+        self.resources.set_quantities(quantities)
+        self.position.x = x
+        self.position.y = y
+        self.in_play = True
+        self.is_turn = False
+        self.match_initiative = None
+        self.alignment.match_initiative = None
+        self.clear_temp()
+
     def start_turn(self, expression=None, display_message=None):
         self.is_turn = True
 
@@ -276,7 +381,24 @@ class MatchCharacter(InitiativeContext):
         return self.in_play
 
     def remove_from_play(self, expression=None, display_message=None):
-        self.in_play = False
+        self.set_in_play(False)
+
+    # Walks the path to the destination it was given by terrain targeting
+    def move(self, expression=None, display_message=None):
+        destination = self.temp_atr.get(DESTINATION)
+        if destination is not None:
+            self.get_match().board.move_along(self, destination.path, display_message=display_message)
+
+    # A character out of play is lifted off the board, so it neither blocks the way nor can be targeted
+    def set_in_play(self, in_play):
+        if in_play != self.in_play:
+            self.in_play = in_play
+            if self.match is not None:
+                self.match.update_in_play(self, in_play)
+                if in_play:
+                    self.match.board.place(self)
+                else:
+                    self.match.board.lift(self)
 
     def attack(self, expression, display_message=None):
         actor = self.get(ACTOR)
@@ -290,7 +412,8 @@ class MatchCharacter(InitiativeContext):
         actor.set_temp(ATTACK_ATTRIBUTES, TempAttributes(attack_attributes))
         actor.trigger_hook(ATTACKING)
 
-        display_message.add_section("Attack to be done\n" + json.dumps(attack_attributes), level=2)
+        if is_displayed(display_message):
+            display_message.add_section("Attack to be done\n" + json.dumps(attack_attributes), level=2)
         if self.check_conditions(expression[HIT_CONDITIONS], display_message):
             damage_attributes = {
                 TYPE: self.eval(expression[TYPE], display_message=display_message),
@@ -299,7 +422,8 @@ class MatchCharacter(InitiativeContext):
             self.set_temp(DAMAGE_ATTRIBUTES, TempAttributes(damage_attributes))
             actor.set_temp(DAMAGE_ATTRIBUTES, TempAttributes(damage_attributes))
             self.trigger_hook(ATTACKED)
-            display_message.add_section("Damage to be done\n" + json.dumps(damage_attributes), level=2)
+            if is_displayed(display_message):
+                display_message.add_section("Damage to be done\n" + json.dumps(damage_attributes), level=2)
 
             self.damage()
 
@@ -314,31 +438,38 @@ class MatchCharacter(InitiativeContext):
         damage_attributes = self.get(DAMAGE_ATTRIBUTES)
         damage = damage_attributes.get(DAMAGE)
 
-        self.resources.debit(self.resources.get(HIT_POINT), damage)
+        self.resources.debit(HIT_POINT, damage)
+        match = self.get_match()
+        if match.observer is not None:
+            match.observer.add_damage(match.current_action, actor, self, damage)
         self.trigger_hook(DAMAGE_TAKEN)
         actor.trigger_hook(DAMAGE_DONE)
 
+    # Only a character with abilities on its roll hook gets to see the roll before it counts
     def roll(self, expression, display_message=None):
-        self.set_temp(ROLL_ATTRIBUTES, {CURRENT_ROLL: super().roll(expression, display_message=display_message)})
+        roll = super().roll(expression, display_message=display_message)
+        if ROLL not in self.subscriptions:
+            return roll
+        self.set_temp(ROLL_ATTRIBUTES, {CURRENT_ROLL: roll})
         self.trigger_hook(ROLL)
         roll = self.get(ROLL_ATTRIBUTES)[CURRENT_ROLL]
         self.clear_temp(ROLL_ATTRIBUTES)
         return roll
 
     def credit_effect(self, expression, display_message=None):
-        self.get_temp(expression.get(TARGET)).resources.get(expression[ARGUMENTS][0]).credit(
-            self.eval(expression[ARGUMENTS][1], display_message=display_message))
+        self.get_temp(expression.get(TARGET)).resources.credit(
+            expression[ARGUMENTS][0], self.eval(expression[ARGUMENTS][1], display_message=display_message))
 
     def debit_effect(self, expression, display_message=None):
-        self.get_temp(expression.get(TARGET)).resources.get(expression[ARGUMENTS][0]).debit(
-            self.eval(expression[ARGUMENTS][1], display_message=display_message))
+        self.get_temp(expression.get(TARGET)).resources.debit(
+            expression[ARGUMENTS][0], self.eval(expression[ARGUMENTS][1], display_message=display_message))
 
     def set_effect(self, expression, display_message=None):
-        self.get_temp(expression.get(TARGET)).resources.get(expression[ARGUMENTS][0]).set_func(
-            self.eval(expression[ARGUMENTS][1], display_message=display_message))
+        self.get_temp(expression.get(TARGET)).resources.set_func(
+            expression[ARGUMENTS][0], self.eval(expression[ARGUMENTS][1], display_message=display_message))
 
     def get_quantity(self, expression, display_message=None):
-        return self.resources.get(expression[VALUE]).quantity
+        return self.resources.get_quantity(expression[VALUE])
 
     def get_temp(self, key, display_message=None):
         value = self.temp_atr.get(key)
@@ -347,10 +478,11 @@ class MatchCharacter(InitiativeContext):
         return value
 
     def get(self, key):
-        if isinstance(key, str) and (re_match(REGEX_SAVE, key) or re_match(REGEX_AM, key)):
-            attribute = key.split(SEPARATOR)[0]
+        modifier = get_modifier(key)
+        if modifier is not None:
+            attribute, is_save = modifier
             value = math.floor((self.get(attribute) - 10) / 2)
-            if (attribute in self.proficiencies) and re_match(REGEX_SAVE, key):
+            if is_save and attribute in self.proficiencies:
                 value += self.proficiency_bonus
             return value
         else:
@@ -365,25 +497,116 @@ class MatchCharacter(InitiativeContext):
             return super().__str__()
 
 
+# Ability modifier and save keys, by key, as the attribute they modify and whether they're a save;
+# any other key maps to None
+modifiers = {}
+
+
+def get_modifier(key):
+    if key in modifiers:
+        return modifiers[key]
+    modifier = None
+    if isinstance(key, str) and (re_match(REGEX_SAVE, key) or re_match(REGEX_AM, key)):
+        modifier = (key.split(SEPARATOR)[0], re_match(REGEX_SAVE, key))
+    modifiers[key] = modifier
+    return modifier
+
+
+# An ability on one of its character's hooks, with its conditions compiled and its trigger built once
+class Subscription:
+    def __init__(self, ability, targeting):
+        self.ability = ability
+        self.targeting = targeting
+        self.trigger = Trigger(ability.trigger)
+        self.conditions = None if ability.conditions is None else get_compiled_conditions(ability.conditions)
+
+    def check_conditions(self, character, display_message=None):
+        return self.conditions is not None and self.conditions(character, display_message)
+
+
 class TempAttributes(BasicContext):
+    __slots__ = ()
+
     def __init__(self, attributes):
         super().__init__(properties=attributes)
 
 
+# Every character gets its own MatchAlignment, and alignments with the same name are the same alignment
 class MatchAlignment(InitiativeContext):
     def __init__(self, properties=None, name='', base=None):
         self.match_initiative = None
         super().__init__(properties, name, base)
 
-        self.function_map[INITIATIVE] = self.get_initiative
+    def __eq__(self, obj):
+        return isinstance(obj, MatchAlignment) and self.name == obj.name
 
+    def __hash__(self):
+        return hash(self.name)
 
+
+# A skill's availability is kept while the resource quantities its conditions read stay the same,
+# and its targeting is built once and keeps its actions while its targets stay the same
 class MatchSkill(BasicContext):
     def __init__(self, properties=None, name='', base=None):
         self.targeting = None
         self.conditions = []
         self.trigger = None
+        self.condition_resources = None
+        self.condition_inputs = None
+        self.available = False
+        self.match_targeting = None
         super().__init__(properties, name, base)
+        self.condition_resources = get_condition_resources(self.conditions)
+
+    def is_available(self, character):
+        if self.condition_resources is None:
+            return character.check_conditions(self.conditions)
+        inputs = tuple(character.resources.get_quantity(resource_name) for resource_name in self.condition_resources)
+        if inputs != self.condition_inputs:
+            self.condition_inputs = inputs
+            self.available = character.check_conditions(self.conditions)
+        return self.available
+
+    def get_targeting(self, character):
+        if self.match_targeting is None:
+            self.match_targeting = get_targeting(expression=self[TARGETING], base=character)
+        return self.match_targeting
+
+
+# The resources whose quantities a skill's conditions read, or None when they read anything else
+def get_condition_resources(conditions):
+    resource_names = []
+    if conditions is not None:
+        for condition in conditions:
+            if not add_quantity_reads(condition, resource_names):
+                return None
+    return resource_names
+
+
+def add_quantity_reads(expression, resource_names):
+    if type(expression) is not dict:
+        return not isinstance(expression, BasicContext)
+    elif len(expression) != 1:
+        return False
+    key = get_child_key(expression)
+    value = expression[key]
+    if key == QUANTITY:
+        resource_name = value.get(VALUE) if type(value) is dict else None
+        if not isinstance(resource_name, str):
+            return False
+        if resource_name not in resource_names:
+            resource_names.append(resource_name)
+        return True
+    elif key in QUANTITY_OPERATORS and type(value) is dict:
+        arguments = value.get(ARGUMENTS)
+        if not is_list(arguments):
+            arguments = [arguments]
+        return all(add_quantity_reads(argument, resource_names) for argument in arguments)
+    return False
+
+
+QUANTITY_OPERATORS = {ADDITION, SUBTRACTION, MULTIPLICATION, DIVISION, MAXIMUM, MINIMUM,
+                      GREATER, LESS, GREATER_OR_EQUAL, LESS_OR_EQUAL, AND, OR, NOT}
 
 
 class MatchAbility(BasicContext):
@@ -402,13 +625,18 @@ def get_abstain_action(character):
     return MatchAction(character, skill, character, targeting, base=character)
 
 
+# An action's expected damage is kept with the state of its actor and target it was worked out for (see dice)
 class MatchAction(BasicContext):
+    __slots__ = ('actor', 'target', 'targeting', 'skill_name', 'trigger', 'damage_inputs', 'expected_damage')
+
     def __init__(self, actor=None, skill=None, target=None, targeting=None, properties=None, name='', base=None):
         self.actor = actor
         self.target = target
         self.targeting = targeting
         self.skill_name = skill.name
         self.trigger = skill.get(TRIGGER)
+        self.damage_inputs = None
+        self.expected_damage = None
         if name == '':
             name = skill.name
         super().__init__(properties=properties, name=name, base=base)
@@ -422,14 +650,23 @@ class MatchAction(BasicContext):
 
 
 class Targeting(BasicContext):
+    __slots__ = ('targets', 'actions')
+
     def __init__(self, properties=None, name='', base=None):
         if name == '':
             name = properties.get(PROFILE)
+        self.targets = None
+        self.actions = None
         super().__init__(properties, name, base)
 
+    # The actions are rebuilt only when the targets changed since the last time
     def get_actions(self, skill):
         targets = self.get_targets()
-        return [MatchAction(self.base, skill, target, self, base=skill) for target in targets]
+        if self.targets is None or len(targets) != len(self.targets) \
+                or any(target is not previous for target, previous in zip(targets, self.targets)):
+            self.targets = targets
+            self.actions = [MatchAction(self.base, skill, target, self, base=skill) for target in targets]
+        return self.actions
 
     def get_targets(self):
         return []
@@ -440,13 +677,15 @@ class Targeting(BasicContext):
             for effect in trigger.success_effects:
                 context.affect(effect, actor, display_message=display_message)
         else:
-            for effect in trigger.failaure_effects:
+            for effect in trigger.failure_effects:
                 context.affect(effect, actor, display_message=display_message)
         for effect in trigger.effects:
             context.affect(effect, actor, display_message=display_message)
 
 
 class SelfTargeting(Targeting):
+    __slots__ = ()
+
     def __init__(self, properties=None, name='', base=None):
         super().__init__(properties, name, base)
 
@@ -454,12 +693,117 @@ class SelfTargeting(Targeting):
         return [self.base]
 
 
+# Other characters within the targeting's range of the base, and of its affinity; without a range, anywhere
 class SingleTargeting(Targeting):
+    __slots__ = ()
+
+    def __init__(self, properties=None, name='', base=None):
+        super().__init__(properties, name, base)
+
+    def get_targets(self):
+        affinity = self.get(AFFINITY)
+        characters = self.get_match().board.get_characters_within(self.base.position, self.get(RANGE))
+        return [character for character in characters
+                if character is not self.base and is_affine(self.base, character, affinity)]
+
+
+# Destinations within one move of the base, among the other characters in play of the targeting's affinity.
+# Approaching, there is one for each of them: the reachable square nearest to it, named after it, when that is
+# nearer than where the base stands. Retreating, there is the reachable square out of their striking range,
+# or as near to out of it as the base gets (see get_retreat_tiles)
+class TerrainTargeting(Targeting):
+    __slots__ = ()
+
     def __init__(self, properties=None, name='', base=None):
         super().__init__(properties, name, base)
 
     def get_targets(self):
-        return [character for character in self.get_match().match_characters if character is not self.base]
+        board = self.get_match().board
+        speed = self.base.get(BASE_SPEED)
+        walks = board.get_walks(self.base, 0 if speed is None else int(speed // SQUARE_FEET))
+        if len(walks) == 0:
+            return []
+
+        affinity = self.get(AFFINITY)
+        square = board.squares[self.base]
+        characters = [character for character in board.get_characters_within(self.base.position)
+                      if character is not self.base and character.is_in_play()
+                      and is_affine(self.base, character, affinity)]
+        # Once the base moves off its square nobody else is left on it, unless they shared it
+        vacated_square = square if board.occupancy[square] == 1 else None
+        if self.get(DIRECTION) == RETREAT:
+            return get_retreat_tiles(board, square, walks, characters, vacated_square)
+
+        # Walks are in the order they are reached, so of the squares as near the first is reached in the fewest steps
+        tiles = []
+        for character in characters:
+            target_square = board.squares[character]
+            distance, destination = board.get_distance_field(target_square, vacated_square).get_nearest(list(walks))
+            if distance < get_distance(square, target_square):
+                tiles.append(Tile(destination[0], destination[1], get_path(walks, destination), name=character.name))
+        return tiles
+
+    # The actor is the one affected, moving to the tile it was given
+    def act(self, context, trigger, actor=None, display_message=None):
+        actor.set_temp(DESTINATION, context)
+        super().act(actor, trigger, actor=actor, display_message=display_message)
+        actor.clear_temp(DESTINATION)
+
+
+# A threat could strike a square next turn if it is within its walk and reach of it. The danger of a square is how
+# many squares short of out of striking range it is, for the most dangerous of the threats. Retreating goes to
+# the reachable square in the least danger, in the fewest steps, named after the threat most dangerous now,
+# when that is less danger than where the base stands
+def get_retreat_tiles(board, square, walks, threats, vacated_square):
+    dangers = {walk_square: 0 for walk_square in walks}
+    steps = max(walk[0] for walk in walks.values())
+    # The squares around the base that the way from where it stands leads through
+    neighbors = [neighbor for neighbor in get_neighbors(square) if neighbor in walks]
+    danger = 0
+    most_dangerous = None
+    for threat in sorted(threats, key=lambda threat: get_distance(square, board.squares[threat])):
+        threat_square = board.squares[threat]
+        safe_distance = get_striking_distance(threat) + 1
+        if get_distance(square, threat_square) - steps >= safe_distance:
+            continue
+        distance_field = board.get_distance_field(threat_square, vacated_square)
+        # Nearer threats come first, and a square is only measured if this one could be more dangerous there
+        squares = [walk_square for walk_square in walks
+                   if safe_distance - get_distance(walk_square, threat_square) > dangers[walk_square]]
+        distances = distance_field.get_distances(squares, safe_distance)
+        for walk_square in squares:
+            dangers[walk_square] = max(dangers[walk_square], safe_distance - distances[walk_square])
+
+        if get_distance(square, threat_square) == 1:
+            distance = 1
+        else:
+            distance = 1 + min(distance_field.get_distances(neighbors, safe_distance).values())
+        if safe_distance - distance > danger:
+            danger = safe_distance - distance
+            most_dangerous = threat
+
+    destination = min(walks, key=lambda walk_square: dangers[walk_square])
+    if most_dangerous is None or dangers[destination] >= danger:
+        return []
+    return [Tile(destination[0], destination[1], get_path(walks, destination), name=most_dangerous.name)]
+
+
+# How far in squares a character can strike from next turn: its walk and then its reach
+def get_striking_distance(character):
+    speed = character.get(BASE_SPEED)
+    reach = character.get(REACH)
+    if reach is None:
+        reach = SQUARE_FEET
+    return (0 if speed is None else int(speed // SQUARE_FEET)) + int(reach // SQUARE_FEET)
+
+
+def is_affine(character, other, affinity):
+    if affinity == HOSTILE:
+        return other.alignment != character.alignment
+    elif affinity == FRIENDLY:
+        return other.alignment == character.alignment
+    else:
+        return True
 
 
 # TODO: add more targeting
@@ -470,17 +814,21 @@ def get_targeting(expression=None, base=None):
         return SingleTargeting(properties=expression, base=base)
     elif expression.get(PROFILE) == RANGED_TARGET:
         return SingleTargeting(properties=expression, base=base)
+    elif expression.get(PROFILE) == TILE_TARGET:
+        return TerrainTargeting(properties=expression, base=base)
     else:
         return SelfTargeting(properties=expression, base=base)
 
 
 class Trigger(BasicContext):
+    __slots__ = ('conditions', 'effects', 'success_effects', 'failure_effects')
+
     def __init__(self, properties=None, name='', base=None):
         super().__init__(properties, name=name, base=base)
-        self.conditions = properties.get(CONDITIONS)
-        self.effects = properties.get(EFFECTS)
-        self.success_effects = properties.get(SUCCESS_EFFECTS)
-        self.failure_effects = properties.get(FAILURE_EFFECTS)
+        self.conditions = self.properties.get(CONDITIONS)
+        self.effects = self.properties.get(EFFECTS)
+        self.success_effects = self.properties.get(SUCCESS_EFFECTS)
+        self.failure_effects = self.properties.get(FAILURE_EFFECTS)
 
         if self.conditions is None:
             self.conditions = []
@@ -497,112 +845,424 @@ class Trigger(BasicContext):
         return super().check_conditions(conditions, display_message=display_message)
 
 
+# Quantities are kept densely, a slot for each resource the environment defines, next to the resource's
+# initial quantity, maximum, compulsoriness and value. Constant definitions are stored once; the others are
+# evaluated again at the start of every match, so their dice roll on the match's die (see evaluate).
+# A re-contexted resource set is a view that shares these slots
 class MatchResourceSet(BasicContext):
     def __init__(self, character=None, properties=None, name='', base=None):
         if properties is None:
             properties = {}
 
-        if properties.get(RESOURCES) is None:
-            resources = {}
-        else:
-            resources = properties.get(RESOURCES)
-
         if character is None:
             if properties is not None:
                 character = properties.get(CHARACTER)
         else:
             properties[CHARACTER] = character
 
-        self.resource_definitions = self.environment.resources
-        self.resources = resources
+        self.resource_ids = self.environment.resource_ids
         self.character = character
         super().__init__(properties, name, base)
 
+        self.quantities = [0] * len(self.resource_ids)
+        self.tables = {QUANTITY: self.quantities, INITIAL: [], MAX_QUANTITY: [], COMPULSORY: [], VALUE: []}
+        self.match_resources = [None] * len(self.resource_ids)
+        # The definitions to evaluate at the start of each match, as (key, resource id, expression, default)
+        self.expressions = []
+        for resource_name in self.resource_ids:
+            self.define(self.environment.resources[resource_name])
+
+    def define(self, definition):
+        resource_id = len(self.tables[INITIAL])
+        for key, default in ((INITIAL, 0), (MAX_QUANTITY, math.inf), (COMPULSORY, False), (VALUE, 0)):
+            value = definition.get(key)
+            if is_evaluable(value):
+                self.expressions.append((key, resource_id, value, default))
+                value = None
+            self.tables[key].append(default if value is None else value)
+
+    # Called by the match as it starts, once its die is seeded
+    def evaluate(self):
+        for key, resource_id, expression, default in self.expressions:
+            value = self.character.eval(expression)
+            self.tables[key][resource_id] = default if value is None else value
+
+    def get_quantities(self):
+        return list(self.quantities)
+
+    def set_quantities(self, quantities):
+        self.quantities[:] = quantities
+
     def get_total_value(self):
-        value = 0
-        for resource_name in self.resources:
-            resource = self.resources[resource_name]
-            value += resource.quantity * resource.value
-        return value
+        return sum(map(operator.mul, self.quantities, self.tables[VALUE]))
 
     def get(self, key):
-        if key in self.resource_definitions:
-            value = self.resources.get(key)
-            if value is None:
-                return MatchResource(self.resource_definitions[key], self, name=key)
-            else:
-                return value
+        resource_id = self.resource_ids.get(key)
+        if resource_id is not None:
+            resource = self.match_resources[resource_id]
+            if resource is None:
+                resource = MatchResource(self, resource_id, name=key)
+                self.match_resources[resource_id] = resource
+            return resource
         else:
             return super().get(key)
 
-    def credit(self, resource, value):
-        self.set_func(resource, resource.quantity + value)
+    def get_quantity(self, resource_name):
+        return self.quantities[self.resource_ids[resource_name]]
 
-    def debit(self, resource, value):
-        self.set_func(resource, resource.quantity - value)
+    def credit(self, resource_name, value):
+        self.set_func(resource_name, self.get_quantity(resource_name) + value)
 
-    def set_func(self, resource, value):
-        name = resource.name
-        resource.quantity = value
-        if value > resource.max_quantity:
-            value = resource.max_quantity
+    def debit(self, resource_name, value):
+        self.set_func(resource_name, self.get_quantity(resource_name) - value)
 
-        if value > 0:
-            self.resources[name] = resource
+    # A resource that drops to nothing, its maximum counted, is held no longer and reads as 0
+    def set_func(self, resource_name, value):
+        resource_id = self.resource_ids[resource_name]
+        if min(value, self.tables[MAX_QUANTITY][resource_id]) > 0:
+            self.quantities[resource_id] = value
         else:
-            if name in self.resources:
-                self.resources.pop(name)
+            self.quantities[resource_id] = 0
 
 
+# A resource, read and written through its slot in the resource set
 class MatchResource(BasicContext):
-    def __init__(self, properties=None, resource_set=None, name='', base=None, display_message=None):
-        self.quantity = 0
-        self.value = 0
-        super().__init__(properties, name, base)
+    __slots__ = ('resource_set', 'resource_id', 'character')
 
+    def __init__(self, resource_set=None, resource_id=0, name='', base=None):
         self.resource_set = resource_set
+        self.resource_id = resource_id
         self.character = resource_set.character
-        self.initial = self.character.eval(properties.get(INITIAL), display_message=display_message)
-        self.max_quantity = self.character.eval(properties.get(MAX_QUANTITY), display_message=display_message)
-        self.compulsory = self.character.eval(properties.get(COMPULSORY), display_message=display_message)
+        super().__init__(None, name, base)
 
-        if self.initial is None:
-            self.initial = 0
-        if self.max_quantity is None:
-            self.max_quantity = math.inf
-        if self.compulsory is None:
-            self.compulsory = False
+    def get(self, key):
+        table = self.resource_set.tables.get(key)
+        if table is not None:
+            return table[self.resource_id]
+        return super().get(key)
 
     def set_initial(self):
-        self.resource_set.set_func(self, self.initial)
+        self.set_func(self.get(INITIAL))
 
     def credit(self, value):
-        self.resource_set.credit(self, value)
+        self.resource_set.credit(self.name, value)
 
     def debit(self, value):
-        self.resource_set.debit(self, value)
+        self.resource_set.debit(self.name, value)
 
     def set_func(self, value):
-        self.resource_set.set_func(self, value)
+        self.resource_set.set_func(self.name, value)
 
     def get_quantity(self):
-        return self.quantity
+        return self.get(QUANTITY)
 
     def get_max_quantity(self):
-        return self.max_quantity
+        return self.get(MAX_QUANTITY)
 
     def get_damage(self):
-        return self.max_quantity - self.quantity if self.max_quantity is not None else self.quantity
+        return self.get_max_quantity() - self.get_quantity()
 
 
+# Characters are indexed in square buckets, BOARD_BUCKET_SIZE squares to a side,
+# so a range query only visits the buckets its range overlaps.
+# Every square also lists the characters whose reach covers it, kept up to date as they move,
+# so a step through threatened zones is checked without looking at anyone else on the board.
+# Occupied squares can't be walked through; walks and distance fields are kept until one of them changes
 class Board(BasicContext):
     def __init__(self, width=1, height=1, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.width = width
         self.height = height
+        self.buckets = {}
+        self.squares = {}
+        self.placements = {}
+        self.threats = {}
+        self.reaches = {}
+        self.occupancy = {}
+        self.walks = {}
+        self.distance_fields = {}
+
+    # Indexes a character at its position, or re-indexes it if it moved
+    def place(self, character):
+        previous_square = self.squares.pop(character, None)
+        if previous_square is not None:
+            self.buckets[get_bucket(previous_square)].remove(character)
+            self.vacate(previous_square)
+        square = (character.position.x, character.position.y)
+        self.squares[character] = square
+        self.placements.setdefault(character, len(self.placements))
+        self.buckets.setdefault(get_bucket(square), []).append(character)
+        self.occupancy[square] = self.occupancy.get(square, 0) + 1
+        self.clear_paths()
+        self.set_reach(character, get_reach_squares(character, square))
+
+    def lift(self, character):
+        square = self.squares.pop(character, None)
+        if square is not None:
+            self.buckets[get_bucket(square)].remove(character)
+            self.vacate(square)
+            self.set_reach(character, set())
+
+    def vacate(self, square):
+        if self.occupancy[square] > 1:
+            self.occupancy[square] -= 1
+        else:
+            del self.occupancy[square]
+        self.clear_paths()
+
+    def clear_paths(self):
+        self.walks = {}
+        self.distance_fields = {}
+
+    def is_open(self, square):
+        return 0 <= square[0] < self.width and 0 <= square[1] < self.height and square not in self.occupancy
+
+    # Every open square the character can walk to in the given number of steps,
+    # with the number of steps it takes and the square it is reached from
+    def get_walks(self, character, steps):
+        start = self.squares[character]
+        walks = self.walks.get((start, steps))
+        if walks is None:
+            walks = {start: (0, None)}
+            frontier = [start]
+            for step in range(1, steps + 1):
+                next_frontier = []
+                for square in frontier:
+                    for neighbor in get_neighbors(square):
+                        if neighbor not in walks and self.is_open(neighbor):
+                            walks[neighbor] = (step, square)
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            del walks[start]
+            self.walks[(start, steps)] = walks
+        return walks
+
+    # Distance fields are kept per target square and vacated square until a character is placed or lifted
+    def get_distance_field(self, target_square, vacated_square=None):
+        key = (target_square, vacated_square)
+        distance_field = self.distance_fields.get(key)
+        if distance_field is None:
+            distance_field = DistanceField(self, target_square, vacated_square)
+            self.distance_fields[key] = distance_field
+        return distance_field
+
+    # Only the squares that entered or left the character's reach are touched
+    def set_reach(self, character, squares):
+        reach = self.reaches.get(character, set())
+        for square in reach - squares:
+            self.threats[square].remove(character)
+        for square in squares - reach:
+            self.threats.setdefault(square, []).append(character)
+        self.reaches[character] = squares
+
+    # In-play characters hostile to the character whose reach covers the square
+    def get_threateners(self, square, character):
+        return [threatener for threatener in self.threats.get(square, ())
+                if threatener is not character and threatener.is_in_play()
+                and threatener.alignment != character.alignment]
+
+    # Moves a character a square at a time. Leaving a threatened zone triggers the threatener's hook
+    # before the step, as opportunity attacks do, and entering one triggers it after; the character
+    # stops if it is taken out of play on the way
+    def move_along(self, character, path, display_message=None):
+        for x, y in path:
+            threateners = self.get_threateners(self.squares[character], character)
+            next_threateners = self.get_threateners((x, y), character)
+            for threatener in threateners:
+                if threatener not in next_threateners:
+                    threatener.trigger_hook(THREATENED_ZONE_EXIT, display_message=display_message, target=character)
+            if not character.is_in_play():
+                return
+
+            self.move(character, x, y)
+            for threatener in next_threateners:
+                if threatener not in threateners:
+                    threatener.trigger_hook(THREATENED_ZONE_ENTRANCE, display_message=display_message,
+                                            target=character)
+            character.trigger_hook(MOVEMENT, display_message=display_message)
+            if not character.is_in_play():
+                return
+
+    def move(self, character, x, y):
+        character.position.x = x
+        character.position.y = y
+        self.place(character)
+
+    # Characters within distance feet of the position, in the order they were placed
+    def get_characters_within(self, position, distance=None):
+        if distance is None:
+            characters = list(self.squares)
+        else:
+            reach = int(distance // SQUARE_FEET)
+            characters = []
+            for bucket_x in range((position.x - reach) // BOARD_BUCKET_SIZE,
+                                  (position.x + reach) // BOARD_BUCKET_SIZE + 1):
+                for bucket_y in range((position.y - reach) // BOARD_BUCKET_SIZE,
+                                      (position.y + reach) // BOARD_BUCKET_SIZE + 1):
+                    for character in self.buckets.get((bucket_x, bucket_y), ()):
+                        x, y = self.squares[character]
+                        if max(abs(x - position.x), abs(y - position.y)) <= reach:
+                            characters.append(character)
+        characters.sort(key=self.placements.get)
+        return characters
+
+
+# Walking distances in squares to a target square, around occupied squares. A square that occupied squares
+# can't lengthen the way to is as near as on an open board (see is_shadowed); the rest of the field is filled in
+# lazily, best first toward whichever squares are asked about, and what it settles stays exact for later queries.
+# The vacated square is the one the character about to move stands on, and doesn't block the way
+class DistanceField:
+    def __init__(self, board, square, vacated_square=None):
+        self.board = board
+        self.square = square
+        self.vacated_square = vacated_square
+        # Nearest first, so a square only looks at the ones nearer than itself
+        self.obstacles = sorted((get_distance(square, occupied_square), occupied_square)
+                                for occupied_square in board.occupancy
+                                if occupied_square != square and occupied_square != vacated_square)
+        self.distances = {}
+        self.frontier = {square: 0}
+
+    # The distance to each of the open squares, or the limit for those no nearer than it
+    def get_distances(self, squares, limit=math.inf):
+        distances = {}
+        unsettled = []
+        x, y = self.square
+        for square in squares:
+            distance = max(abs(square[0] - x), abs(square[1] - y))
+            if distance >= limit:
+                distances[square] = limit
+            elif not self.is_shadowed(square, distance):
+                distances[square] = distance
+            elif square in self.distances:
+                distances[square] = min(self.distances[square], limit)
+            else:
+                unsettled.append(square)
+        if len(unsettled) > 0:
+            self.settle(unsettled, limit)
+            for square in unsettled:
+                distances[square] = min(self.distances.get(square, limit), limit)
+        return distances
+
+    def get_distance(self, square, limit=math.inf):
+        return self.get_distances((square,), limit)[square]
+
+    # Whether occupied squares could make the way to the square longer than on an open board. A lone one only
+    # does if every shortest way passes through it: each step of a shortest way advances one line along the axis
+    # the squares are furthest apart on, and it is the one square on its line that the ways can cross
+    def is_shadowed(self, square, distance):
+        shadow = None
+        for obstacle_distance, obstacle in self.obstacles:
+            if obstacle_distance >= distance:
+                break
+            if obstacle_distance + max(abs(square[0] - obstacle[0]), abs(square[1] - obstacle[1])) == distance:
+                if shadow is not None:
+                    return True
+                shadow = obstacle
+        if shadow is None:
+            return False
+        major = 0 if abs(square[0] - self.square[0]) >= abs(square[1] - self.square[1]) else 1
+        minor = 1 - major
+        line = abs(shadow[major] - self.square[major])
+        size = self.board.height if major == 0 else self.board.width
+        low = max(self.square[minor] - line, square[minor] - (distance - line), 0)
+        high = min(self.square[minor] + line, square[minor] + (distance - line), size - 1)
+        return low == high
+
+    # The nearest of the open squares and its distance, the first in order of those as near.
+    # The open board distance is a lower bound, so squares are checked in its order until none can be nearer
+    def get_nearest(self, squares):
+        x, y = self.square
+        heap = [(max(abs(square[0] - x), abs(square[1] - y)), index, False, square)
+                for index, square in enumerate(squares)]
+        heapq.heapify(heap)
+        while len(heap) > 0:
+            distance, index, is_exact, square = heapq.heappop(heap)
+            if not is_exact:
+                walking_distance = self.get_distance(square)
+                if walking_distance > distance:
+                    heapq.heappush(heap, (walking_distance, index, True, square))
+                    continue
+            return distance, square
+        return math.inf, None
+
+    # Settles squares toward the box the squares lie in, until every one of them is settled or none left
+    # can be nearer than the limit
+    def settle(self, squares, limit=math.inf):
+        unsettled = set(squares)
+        min_x = min(square[0] for square in unsettled)
+        max_x = max(square[0] for square in unsettled)
+        min_y = min(square[1] for square in unsettled)
+        max_y = max(square[1] for square in unsettled)
+
+        def estimate(square):
+            return max(min_x - square[0], square[0] - max_x, min_y - square[1], square[1] - max_y, 0)
+
+        # Ties go to the square furthest along, which heads straight for the squares
+        heap = [(distance + estimate(square), -distance, square) for square, distance in self.frontier.items()]
+        heapq.heapify(heap)
+        distances = self.distances
+        frontier = self.frontier
+        width = self.board.width
+        height = self.board.height
+        occupancy = self.board.occupancy
+        while len(heap) > 0 and heap[0][0] < limit:
+            _, distance, square = heapq.heappop(heap)
+            distance = -distance
+            if frontier.get(square) != distance:
+                continue
+            del frontier[square]
+            distances[square] = distance
+            # A settled square's neighbors are always put on the frontier, so later queries carry on from it
+            for neighbor in get_neighbors(square):
+                if neighbor not in distances and distance + 1 < frontier.get(neighbor, math.inf) \
+                        and (neighbor == self.vacated_square
+                             or (0 <= neighbor[0] < width and 0 <= neighbor[1] < height and neighbor not in occupancy)):
+                    frontier[neighbor] = distance + 1
+                    heapq.heappush(heap, (distance + 1 + estimate(neighbor), -distance - 1, neighbor))
+            if square in unsettled:
+                unsettled.remove(square)
+                if len(unsettled) == 0:
+                    return
+
+
+def get_path(walks, square):
+    path = []
+    while square in walks:
+        path.append(square)
+        square = walks[square][1]
+    path.reverse()
+    return path
+
+
+def get_neighbors(square):
+    x, y = square
+    return ((x - 1, y - 1), (x, y - 1), (x + 1, y - 1), (x - 1, y), (x + 1, y), (x - 1, y + 1), (x, y + 1),
+            (x + 1, y + 1))
+
+
+def get_distance(square, other_square):
+    return max(abs(square[0] - other_square[0]), abs(square[1] - other_square[1]))
+
+
+def get_bucket(square):
+    return square[0] // BOARD_BUCKET_SIZE, square[1] // BOARD_BUCKET_SIZE
+
+
+# A character's reach is five feet unless it says otherwise
+def get_reach_squares(character, square):
+    reach = character.get(REACH)
+    if reach is None:
+        reach = SQUARE_FEET
+    reach = int(reach // SQUARE_FEET)
+    x, y = square
+    return {(reach_x, reach_y) for reach_x in range(x - reach, x + reach + 1)
+            for reach_y in range(y - reach, y + reach + 1)}
 
 
 class Position(BasicContext):
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0, y=0, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.x = x
@@ -621,3 +1281,12 @@ class Position(BasicContext):
             return self.y
         else:
             return super().get(key)
+
+
+# A square to move to, with the path that gets there
+class Tile(Position):
+    __slots__ = ('path',)
+
+    def __init__(self, x=0, y=0, path=None, properties=None, name='', base=None):
+        super().__init__(x, y, properties, name, base)
+        self.path = path
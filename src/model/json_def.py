@@ -21,6 +21,25 @@ MAX_STRATEGY_COMPLEXITY = 'max_strategy_complexity'
 MUTATION_COEFFICIENT = 'mutation_coefficient'
 FITNESS_IMPROVEMENT_THRESHOLD = 'fitness_improvement_threshold'
 STRATEGY_GROUPING = 'strategy_grouping'
+SIMULATION_BATCH_SIZE = 'simulation_batch_size'
+SEED = 'seed'
+EVALUATION = 'evaluation'
+EVALUATION_MODE = 'mode'
+ROUND_SIMULATIONS = 'round_simulations'
+CONFIDENCE = 'confidence'
+ENGINE = 'engine'
+TIE_BREAK = 'tie_break'
+
+# Evaluation Modes
+FULL_EVALUATION = 'full'
+RACING_EVALUATION = 'racing'
+
+# Tie Breaks
+EXPECTED_DAMAGE_TIE_BREAK = 'expected_damage'
+
+# Simulation Engines
+OBJECT_ENGINE = 'object'
+BATCH_ENGINE = 'batch'
 
 # Key 5ebb-JSON Properties
 PROFILE = 'profile'
@@ -93,9 +112,14 @@ HOSTILE = 'hostile'
 FRIENDLY = 'friendly'
 SELF = 'self'
 
+# Directions
+APPROACH = 'approach'
+RETREAT = 'retreat'
+
 # D&D Skills
 ABSTAIN = 'abstain'
 MOVEMENT_SKILL = 'movement'
+RETREAT_SKILL = 'retreat'
 DODGE = 'dodge'
 ATTACK = 'attack'
 ACTION_ATTACK = 'action_attack'
@@ -133,6 +157,11 @@ POSITION = 'position'
 INITIATIVE = 'initiative'
 BOARD_WIDTH = 'board_width'
 BOARD_HEIGHT = 'board_height'
+RANGE = 'range'
+AFFINITY = 'affinity'
+DIRECTION = 'direction'
+REACH = 'reach'
+BASE_SPEED = 'base_speed'
 
 LEVEL = 'level'
 MAX_HP = 'max_hp'
@@ -152,6 +181,7 @@ DAMAGE_ATTRIBUTES = 'damage_attributes'
 ROLL_ATTRIBUTES = 'roll_attributes'
 ATTRIBUTES = 'attributes'
 ACTOR = 'actor'
+DESTINATION = 'destination'
 
 HIT_METRIC = 'hit_metric'
 SAVE_METRIC = 'save_metric'
@@ -18,6 +18,10 @@ TEENY_DIVIDER = "\n-----\n"
 THICK_SEPARATOR = "||"
 THIN_SEPARATOR = "|"
 
+# Commands
+COMMAND_ANALYZE = 'analyze'
+COMMAND_DAMAGE = 'damage'
+
 # Regular Expressions
 REGEX_QUIT = 'q$|quit$'
 REGEX_INFO = 'i$|info$'
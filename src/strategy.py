@@ -1,5 +1,8 @@
 from match import *
 from basic import *
+from batch import get_fitness_sets
+from dice import get_action_damage, get_expected_damages
+from analytics import MatchAggregate, get_aggregate, ANALYSIS_BATCH_SIZE
 
 from multiprocessing.pool import Pool
 
@@ -7,9 +10,22 @@ from multiprocessing.pool import Pool
 # Strategy
 
 
+DEFAULT_SIMULATION_BATCH_SIZE = 10
+DEFAULT_CONFIDENCE = 2
+SEED_BITS = 32
+FITNESS_CACHE_LIMIT = 1024
+
+
 class StrategyManager(BasicContext):
-    def __init__(self, match_data, expression):
+    def __init__(self, match_data, expression, config=None):
         super().__init__()
+        self.config = config
+        self.pool = None
+        # All of the optimizer's randomness comes from here, so a seeded run is reproducible
+        self.random = random.Random(expression.get(SEED))
+        self.seeds = []
+        self.fitness_cache = {}
+        self.match_templates = {}
         self.character_templates = []
         self.match_data = match_data
         self.match = None
@@ -23,6 +39,14 @@ class StrategyManager(BasicContext):
         self.mutation_coefficient = expression[MUTATION_COEFFICIENT]
         self.fitness_improvement_threshold = expression[FITNESS_IMPROVEMENT_THRESHOLD]
         self.strategy_grouping = expression[STRATEGY_GROUPING]
+        self.simulation_batch_size = expression.get(SIMULATION_BATCH_SIZE, DEFAULT_SIMULATION_BATCH_SIZE)
+        self.engine = expression.get(ENGINE, OBJECT_ENGINE)
+        self.tie_break = expression.get(TIE_BREAK)
+
+        evaluation = expression.get(EVALUATION, {})
+        self.evaluation_mode = evaluation.get(EVALUATION_MODE, FULL_EVALUATION)
+        self.round_simulations = max(2, evaluation.get(ROUND_SIMULATIONS, self.simulation_batch_size))
+        self.confidence = evaluation.get(CONFIDENCE, DEFAULT_CONFIDENCE)
 
         for definition_name in match_data[GAME_CHARACTERS]:
             characters = create_contexts(self.environment.characters[definition_name], MatchCharacter)
@@ -34,14 +58,31 @@ class StrategyManager(BasicContext):
     def get_strategy_name(self, character):
         return character.eval(self.strategy_grouping)
 
+    def get_character_template(self, name):
+        return select(self.character_templates, lambda character: character.name == name)
+
+    # Workers are started once and keep their environment between generations
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = Pool(initializer=init_worker, initargs=(self.config,))
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
     # Sole source of display_messages
     def step(self, display):
         display_message = DisplayMessage(display)
         match_context = MatchContext(self.maximum_turns, properties=self.match_data,
                                      strategies=self.strategies, display_message=display_message)
         display_message.input()
-        match_context.simulate(display=display)
+        match_context.simulate(display=display, sink=DisplayMessage)
 
+    # Logs how many matches each generation simulated and saved, and returns how many were simulated in all,
+    # and how many playing every strategy on every seed would have taken
     def optimize(self, strategy_name):
         old_strategy = self.strategies[strategy_name]
         if old_strategy is None:
@@ -53,6 +94,7 @@ class StrategyManager(BasicContext):
 
         last_fitness = -math.inf
         best_strategy = Strategy(self, name=strategy_name, nodes=[])
+        simulations = budget = 0
         while (last_fitness * self.fitness_improvement_threshold) < best_strategy.fitness:
             last_fitness = best_strategy.fitness
 
@@ -67,42 +109,161 @@ class StrategyManager(BasicContext):
                 strategy2 = mergeable_strategies.pop()
                 strategies.append(strategy1.merge(strategy2))
 
-            with Pool() as pool:
-                for strategy in strategies:
-                    temp_strategies = StrategyMap(self, self.strategies.strategies)
-                    temp_strategies[strategy_name] = strategy
-                    fitness_set_values = pool.imap_unordered(
-                        get_fitness,
-                        self.get_match_context_generator(temp_strategies)
-                        )
-                    fitness_values = map(lambda fitness_set: fitness_set.get(strategy_name), fitness_set_values)
-                    total_fitness = sum(fitness_values)
-
-                    average_fitness = total_fitness / self.simulations_per_strategy
-                    self.log("Strategy " + strategy.name + " averaged a fitness of " + str(average_fitness))
-                    strategy.fitness = average_fitness
+            generation_simulations, generation_budget = self.evaluate(strategies, strategy_name)
+            simulations += generation_simulations
+            budget += generation_budget
+            self.log("Generation simulated " + str(generation_simulations) + " of " + str(generation_budget)
+                     + " matches, saving " + str(generation_budget - generation_simulations))
+            for strategy in strategies:
+                self.log("Strategy " + strategy.name + " averaged a fitness of " + str(strategy.fitness))
 
-                    cloneable_strategies.append(strategy)
-                    mutateable_strategies.append(strategy)
-                    mergeable_strategies.append(strategy)
+                cloneable_strategies.append(strategy)
+                mutateable_strategies.append(strategy)
+                mergeable_strategies.append(strategy)
 
-                    if strategy.fitness > best_strategy.fitness:
-                        best_strategy = strategy
+                if strategy.fitness > best_strategy.fitness:
+                    best_strategy = strategy
 
             cloneable_strategies = self.trim_cloneable(cloneable_strategies)
             mutateable_strategies = self.trim_mutateable(mutateable_strategies)
             mergeable_strategies = self.trim_mergeable(mergeable_strategies)
-            random.shuffle(mergeable_strategies)
+            self.random.shuffle(mergeable_strategies)
 
         self.strategies[strategy_name] = best_strategy
-
-    def get_match_context_generator(self, temp_strategies):
-        count = 0
-        while count < self.simulations_per_strategy:
-            count += 1
-            match_context = MatchContext(self.maximum_turns, properties=self.match_data,
-                                         strategies=temp_strategies)
-            yield match_context
+        return simulations, budget
+
+    # The current strategies, with the given one swapped in, as picklable genomes
+    def get_genomes(self, strategy):
+        genomes = {}
+        for strategy_name in self.strategies.strategies:
+            genomes[strategy_name] = self.strategies.strategies[strategy_name].get_genome()
+        genomes[strategy.name] = strategy.get_genome()
+        return genomes
+
+    # Every strategy plays the same seeds (common random numbers), so they all face the same dice.
+    # Seed i is the same for the manager's lifetime, so fitness records can be topped up rather than redone.
+    # Returns how many matches were simulated, out of the strategies times the seeds
+    def evaluate(self, strategies, strategy_name):
+        seeds = self.get_seeds(self.simulations_per_strategy)
+        records = [self.get_fitness_record(strategy, strategy_name) for strategy in strategies]
+        counts = {id(record): record.get_count() for record in records}
+        if self.evaluation_mode == RACING_EVALUATION:
+            self.race(strategies, strategy_name, seeds, records)
+        else:
+            self.play(strategies, range(len(strategies)), strategy_name, seeds, records)
+
+        for index in range(len(strategies)):
+            strategies[index].fitness = records[index].statistics.mean
+
+        budget = len(strategies) * len(seeds)
+        simulations = sum(record.get_count() - counts[id(record)] for record in set(records))
+        return simulations, budget
+
+    # Plays the seeds in rounds, dropping strategies that are confidently worse than the leader
+    # so the rest of the budget goes to the contenders
+    def race(self, strategies, strategy_name, seeds, records):
+        contenders = list(range(len(strategies)))
+        end = 0
+        while end < len(seeds):
+            end = min(end + self.round_simulations, len(seeds))
+            self.play(strategies, contenders, strategy_name, seeds[:end], records)
+            contenders = self.get_contenders(contenders, records)
+
+    # Contenders have all played the same seeds, so each is compared to the leader seed by seed;
+    # the paired differences have far less variance than either strategy's fitness
+    def get_contenders(self, contenders, records):
+        leader = max(contenders, key=lambda index: records[index].statistics.mean)
+        remaining_contenders = []
+        for index in contenders:
+            difference = RunningStatistics()
+            for leader_fitness, fitness in zip(records[leader].samples, records[index].samples):
+                difference.add(leader_fitness - fitness)
+            if difference.mean - self.confidence * difference.get_standard_error() <= 0:
+                remaining_contenders.append(index)
+        return remaining_contenders
+
+    # Tops every record up to one sample per seed, submitting all the simulations as one job set
+    # so workers never idle between strategies
+    def play(self, strategies, indices, strategy_name, seeds, records):
+        unique_indices = {}
+        for index in indices:
+            unique_indices.setdefault(id(records[index]), index)
+
+        results = {}
+        tasks = self.get_batches(strategies, unique_indices.values(), seeds, records)
+        for index, start, fitness_values in self.get_pool().imap_unordered(simulate_batch, tasks):
+            results[(index, start)] = fitness_values[strategy_name]
+
+        # Collected in seed order, regardless of the order batches finished in
+        for index, start in sorted(results):
+            records[index].add(results[(index, start)])
+
+    # Records are kept least recently used first, and the oldest is dropped once there are FITNESS_CACHE_LIMIT
+    def get_fitness_record(self, strategy, strategy_name):
+        genomes = self.get_genomes(strategy)
+        key = (strategy_name, tuple((name, get_canonical_genome(genomes[name])) for name in sorted(genomes)))
+        record = self.fitness_cache.pop(key, None)
+        if record is None:
+            record = FitnessRecord()
+            if len(self.fitness_cache) >= FITNESS_CACHE_LIMIT:
+                del self.fitness_cache[next(iter(self.fitness_cache))]
+        self.fitness_cache[key] = record
+        return record
+
+    # Plays count matches of a game with the current strategies across the pool, seeded first_seed onwards,
+    # merging each worker's aggregate as it comes back
+    def analyze(self, count, game_name=None, first_seed=0):
+        if game_name is None:
+            game_name = self.match_data[NAME]
+        if game_name not in self.environment.matches:
+            raise KeyError("unknown game " + str(game_name))
+        genomes = {strategy_name: self.strategies.strategies[strategy_name].get_genome()
+                   for strategy_name in self.strategies.strategies}
+        tasks = ((game_name, genomes, start, min(start + ANALYSIS_BATCH_SIZE, first_seed + count))
+                 for start in range(first_seed, first_seed + count, ANALYSIS_BATCH_SIZE))
+
+        aggregate = MatchAggregate()
+        for batch_aggregate in self.get_pool().imap_unordered(simulate_analysis, tasks):
+            aggregate.merge(batch_aggregate)
+        return aggregate
+
+    # Expected damage of each character's attacking skills against the others as a game opens,
+    # with the given seed's rolls for initiative and resources (see dice.get_expected_damages)
+    def get_expected_damages(self, game_name=None, seed=0):
+        if game_name is None:
+            game_name = self.match_data[NAME]
+        if game_name not in self.environment.matches:
+            raise KeyError("unknown game " + str(game_name))
+        match = self.get_match_template(self.environment.matches[game_name])
+        match.reset(strategies=self.strategies, seed=seed)
+        return get_expected_damages(match)
+
+    def get_seeds(self, count):
+        while len(self.seeds) < count:
+            self.seeds.append(self.random.getrandbits(SEED_BITS))
+        return self.seeds[:count]
+
+    def get_batches(self, strategies, indices, seeds, records):
+        for index in indices:
+            genomes = self.get_genomes(strategies[index])
+            for start in range(records[index].get_count(), len(seeds), self.simulation_batch_size):
+                yield index, start, genomes, seeds[start:start + self.simulation_batch_size]
+
+    # One match per game definition, reset for every simulation instead of being rebuilt
+    def get_match_template(self, match_data=None):
+        if match_data is None:
+            match_data = self.match_data
+        template = self.match_templates.get(match_data[NAME])
+        if template is None:
+            template = MatchContext(self.maximum_turns, properties=match_data)
+            self.match_templates[match_data[NAME]] = template
+        return template
+
+    def get_strategy_map(self, genomes):
+        strategies = {}
+        for strategy_name in genomes:
+            strategies[strategy_name] = Strategy(self, name=strategy_name, genome=genomes[strategy_name])
+        return StrategyMap(self, strategies)
 
     def trim_cloneable(self, strategies):
         return trim(strategies, self.cloned_strategy_count, lambda strategy: strategy.fitness)
@@ -114,14 +275,69 @@ class StrategyManager(BasicContext):
         return trim(strategies, self.merged_strategy_count, lambda strategy: strategy.fitness)
 
     def get_random_weight(self):
-        return random.randint(0, 10)
+        return self.random.randint(0, 10)
 
 
 def get_fitness(match_context):
-    match_context.simulate()
+    match_context.simulate(sink=NullDisplayMessage)
     return match_context.get_fitness_set()
 
 
+# Worker processes
+
+worker_manager = None
+
+
+def init_worker(config):
+    global worker_manager
+    environment = load_environment(config)
+    worker_manager = StrategyManager(environment.match_data, config[STRATEGY])
+
+
+# Runs one match per seed and returns every strategy's fitness per seed, tagged with the task's key
+def simulate_batch(task):
+    index, start, genomes, seeds = task
+    strategies = worker_manager.get_strategy_map(genomes)
+    match_context = worker_manager.get_match_template()
+    fitness_values = {}
+    for strategy_name in genomes:
+        fitness_values[strategy_name] = []
+    if worker_manager.engine == BATCH_ENGINE:
+        fitness_sets = get_fitness_sets(match_context, strategies, seeds)
+    else:
+        fitness_sets = []
+        for seed in seeds:
+            match_context.reset(strategies=strategies, seed=seed)
+            fitness_sets.append(get_fitness(match_context))
+    for fitness_set in fitness_sets:
+        for strategy_name in genomes:
+            fitness_values[strategy_name].append(fitness_set.get(strategy_name, 0))
+    return index, start, fitness_values
+
+
+# Plays the task's range of seeds of a game and returns their aggregate
+def simulate_analysis(task):
+    game_name, genomes, start, stop = task
+    strategies = worker_manager.get_strategy_map(genomes)
+    match_context = worker_manager.get_match_template(worker_manager.environment.matches[game_name])
+    return get_aggregate(match_context, strategies, range(start, stop))
+
+
+# Fitness of one strategy against fixed opponents, where sample i was played on the manager's seed i
+class FitnessRecord:
+    def __init__(self):
+        self.samples = []
+        self.statistics = RunningStatistics()
+
+    def add(self, samples):
+        self.samples += samples
+        for sample in samples:
+            self.statistics.add(sample)
+
+    def get_count(self):
+        return self.statistics.count
+
+
 class StrategyMap(BasicContext):
     def __init__(self, strategy_manager, strategies=None):
         self.strategy_manager = strategy_manager
@@ -150,7 +366,7 @@ class StrategyMap(BasicContext):
 class Strategy(BasicContext):
     id = 8888
 
-    def __init__(self, strategy_manager, name='', nodes=None):
+    def __init__(self, strategy_manager, name='', nodes=None, genome=None):
         if name == '':
             name = str(self.id)
             self.id += 1
@@ -158,50 +374,118 @@ class Strategy(BasicContext):
         self.strategy_manager = strategy_manager
         self.name = name
         self.fitness = 0
-        if nodes is None:
+        self.decision_table = None
+        if genome is not None:
+            nodes = [Node(strategy_manager, self, genome=node_genome) for node_genome in genome]
+        elif nodes is None:
             nodes = [Node(strategy_manager, self, strategy_manager.get_random_weight())]
         self.nodes = nodes
 
+    # Genomes are plain tuples of names and numbers, cheap to pickle and rebuild in a worker
+    def get_genome(self):
+        return tuple(node.get_genome() for node in self.nodes)
+
     def merge(self, strategy):
         strategy = Strategy(self.strategy_manager, self.name, self.nodes + strategy.nodes)
         strategy.nodes = trim(strategy.nodes,
                               self.strategy_manager.max_strategy_complexity)
+        strategy.decision_table = None
         return strategy
 
     def mutate(self):
         return Strategy(self.strategy_manager, self.name)
 
-    # TODO: choose_action should filter nodes by condition *before* calculating weights
+    # Only the nodes filed under an action's (actor, skill, target) keys are weighed,
+    # and each distinct condition is checked at most once per decision
     def choose_action(self, match, action_list):
-        weights = {}
-        for action in action_list:
-            weights[action] = 0
-            for node in self.nodes:
-                weights[action] += node.weigh(action)
+        decision_table = self.get_decision_table()
+        conditions = {}
 
         best_action = None
+        tied_actions = []
         largest_weight = -math.inf
-        for action in weights:
-            weight = weights[action]
+        for action in action_list:
+            weight = 0
+            actor_name = action.actor.name
+            target_name = action.target.name
+            for key in ((actor_name, action.name, target_name), (actor_name, action.name, None),
+                        (None, action.name, target_name), (None, action.name, None)):
+                for condition_key, condition, node_weight in decision_table.get(key, ()):
+                    condition_met = conditions.get(condition_key)
+                    if condition_met is None:
+                        condition_met = condition.check_match(match)
+                        conditions[condition_key] = condition_met
+                    if condition_met:
+                        weight += node_weight
+
             if weight > largest_weight:
                 largest_weight = weight
                 best_action = action
+                tied_actions = [action]
+            elif weight == largest_weight:
+                tied_actions.append(action)
 
+        if self.strategy_manager.tie_break == EXPECTED_DAMAGE_TIE_BREAK and len(tied_actions) > 1:
+            best_action = get_most_damaging(tied_actions)
         return best_action
 
+    # Nodes filed by the (actor, skill, target) names their action matches, None matching anyone
+    def get_decision_table(self):
+        if self.decision_table is None:
+            decision_table = {}
+            for node in self.nodes:
+                decision_table.setdefault(node.action.get_key(), []).append(
+                    (node.condition.get_genome(), node.condition, node.weight))
+            self.decision_table = decision_table
+        return self.decision_table
+
+
+# The first of the actions with the most expected damage, analysed exactly; one that isn't analyzable counts as none
+def get_most_damaging(actions):
+    best_action = None
+    most_damage = -math.inf
+    for action in actions:
+        damage = get_action_damage(action)
+        if damage is None:
+            damage = 0
+        if damage > most_damage:
+            most_damage = damage
+            best_action = action
+    return best_action
+
+
+# Strategies that always weigh actions the same share a canonical genome: node order doesn't matter,
+# nodes with the same condition and action add up, and zero weight nodes do nothing
+def get_canonical_genome(genome):
+    weights = {}
+    for weight, condition_genome, action_genome in genome:
+        key = (condition_genome, action_genome)
+        weights[key] = weights.get(key, 0) + weight
+    nodes = [(weights[key],) + key for key in weights if weights[key] != 0]
+    return tuple(sorted(nodes, key=repr))
+
 
 # keep immutable
 class Node(BasicContext):
-    def __init__(self, strategy_manager, strategy, weight=0):
+    def __init__(self, strategy_manager, strategy, weight=0, genome=None):
         super().__init__()
         self.strategy_manager = strategy_manager
         self.strategy = strategy
-        self.weight = weight
-        self.condition = MetaCondition(strategy_manager)
-        self.action = MetaAction(strategy_manager, strategy)
+        if genome is None:
+            self.weight = weight
+            self.condition = MetaCondition(strategy_manager)
+            self.action = MetaAction(strategy_manager, strategy)
+        else:
+            weight, condition_genome, action_genome = genome
+            self.weight = weight
+            self.condition = MetaCondition(strategy_manager, genome=condition_genome)
+            self.action = MetaAction(strategy_manager, strategy, genome=action_genome)
+
+    def get_genome(self):
+        return self.weight, self.condition.get_genome(), self.action.get_genome()
 
     def mutate(self):
-        return Node(self.strategy_manager, self.strategy, self.weight + random.randint(-1, 1))
+        return Node(self.strategy_manager, self.strategy, self.weight + self.strategy_manager.random.randint(-1, 1))
 
     def weigh(self, action):
         if self.check_action(action):
@@ -220,14 +504,25 @@ class Node(BasicContext):
 
 
 class MetaCondition(BasicContext):
-    def __init__(self, strategy_manager=None, properties=None, name='', base=None):
+    def __init__(self, strategy_manager=None, genome=None, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.strategy_manger = strategy_manager
-        self.target = random.choice(strategy_manager.character_templates)
-        self.status = get_meta_status(strategy_manager)
+        if genome is None:
+            self.target = strategy_manager.random.choice(strategy_manager.character_templates)
+            self.status = get_meta_status(strategy_manager)
+        else:
+            target_name, status_genome = genome
+            self.target = strategy_manager.get_character_template(target_name)
+            self.status = get_meta_status(strategy_manager, genome=status_genome)
+
+    def get_genome(self):
+        return self.target.name, self.status.get_genome()
 
     def check(self, action):
-        return self.status.check(select(action.get_match().match_characters,
+        return self.check_match(action.get_match())
+
+    def check_match(self, match):
+        return self.status.check(select(match.match_characters,
                                         lambda character: character.name == self.target.name))
 
     def __str__(self):
@@ -236,15 +531,20 @@ class MetaCondition(BasicContext):
         return string
 
 
-def get_meta_status(strategy_manager):
+def get_meta_status(strategy_manager, genome=None):
+    if genome is not None:
+        status, value = genome
+        return meta_statuses[status](strategy_manager, value)
     # TODO: you know what
-    if random.randint(0, 1) == 0:
-        return HealthMetaStatus(strategy_manager, random.randint(0, 10))
+    if strategy_manager.random.randint(0, 1) == 0:
+        return HealthMetaStatus(strategy_manager, strategy_manager.random.randint(0, 10))
     else:
-        return DamageMetaStatus(strategy_manager, random.randint(0, 10))
+        return DamageMetaStatus(strategy_manager, strategy_manager.random.randint(0, 10))
 
 
 class HealthMetaStatus(BasicContext):
+    status = 'health'
+
     def __init__(self, strategy_manager=None, value=0, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.strategy_manager = strategy_manager
@@ -254,6 +554,9 @@ class HealthMetaStatus(BasicContext):
     def check(self, target):
         return target.get_hp().get_quantity() > self.value
 
+    def get_genome(self):
+        return self.status, self.value
+
     def __str__(self):
         string = ''
         string += '[health] greater than [' + str(self.value) + ']'
@@ -261,6 +564,8 @@ class HealthMetaStatus(BasicContext):
 
 
 class DamageMetaStatus(BasicContext):
+    status = 'damage'
+
     def __init__(self, strategy_manager=None, value=0, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.strategy_manager = strategy_manager
@@ -270,6 +575,9 @@ class DamageMetaStatus(BasicContext):
     def check(self, target):
         return target.get_hp().get_damage() > self.value
 
+    def get_genome(self):
+        return self.status, self.value
+
     def __str__(self):
         string = ''
         string += '[damage] greater than [' + str(self.value) + ']'
@@ -277,21 +585,32 @@ class DamageMetaStatus(BasicContext):
 
 
 class MetaAction(BasicContext):
-    def __init__(self, strategy_manager=None, strategy=None, properties=None, name='', base=None):
+    def __init__(self, strategy_manager=None, strategy=None, genome=None, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.strategy_manager = strategy_manager
-        actors = [character for character in strategy_manager.character_templates
-                  if strategy_manager.get_strategy_name(character) is strategy.name]
-        self.actor = MetaCharacter(strategy_manager, characters=actors)
-        act_names = [] if self.actor.character is None else list(self.actor.character.skills)
-        name = ''
-        if len(act_names) > 0:
-            name = random.choice(act_names)
-        self.act = MetaAct(strategy_manager, name=name)
+        if genome is None:
+            actors = [character for character in strategy_manager.character_templates
+                      if strategy_manager.get_strategy_name(character) is strategy.name]
+            self.actor = MetaCharacter(strategy_manager, characters=actors)
+            act_names = [] if self.actor.character is None else list(self.actor.character.skills)
+            name = ''
+            if len(act_names) > 0:
+                name = strategy_manager.random.choice(act_names)
+            self.act = MetaAct(strategy_manager, name=name)
+        else:
+            actor_genome, act_genome = genome
+            self.actor = MetaCharacter(strategy_manager, genome=actor_genome)
+            self.act = MetaAct(strategy_manager, genome=act_genome)
 
     def check(self, action):
         return self.actor.check(action.actor) and self.act.check(action)
 
+    def get_key(self):
+        return self.actor.get_name(), self.act.name, self.act.target.get_name()
+
+    def get_genome(self):
+        return self.actor.get_genome(), self.act.get_genome()
+
     def __str__(self):
         string = ''
         string += '[' + str(self.actor) + '] ' + str(self.act)
@@ -299,14 +618,21 @@ class MetaAction(BasicContext):
 
 
 class MetaAct(BasicContext):
-    def __init__(self, strategy_manager=None, properties=None, name='', base=None):
+    def __init__(self, strategy_manager=None, genome=None, properties=None, name='', base=None):
+        if genome is None:
+            target_genome = None
+        else:
+            name, target_genome = genome
         super().__init__(properties, name, base)
         self.strategy_manager = strategy_manager
-        self.target = MetaCharacter(strategy_manager)
+        self.target = MetaCharacter(strategy_manager, genome=target_genome)
 
     def check(self, action):
         return self.target.check(action.target) and action.name == self.name
 
+    def get_genome(self):
+        return self.name, self.target.get_genome()
+
     def __str__(self):
         string = ''
         name = self.name
@@ -317,13 +643,18 @@ class MetaAct(BasicContext):
 
 
 class MetaCharacter(BasicContext):
-    def __init__(self, strategy_manager=None, characters=None, properties=None, name='', base=None):
+    def __init__(self, strategy_manager=None, characters=None, genome=None, properties=None, name='', base=None):
         super().__init__(properties, name, base)
         self.strategy_manager = strategy_manager
-        if characters is None:
-            characters = [character for character in strategy_manager.character_templates]
-            characters.append(None)
-        self.character = random.choice(characters)
+        if genome is not None:
+            character_name, = genome
+            self.character = None if character_name is None \
+                else strategy_manager.get_character_template(character_name)
+        else:
+            if characters is None:
+                characters = [character for character in strategy_manager.character_templates]
+                characters.append(None)
+            self.character = strategy_manager.random.choice(characters)
 
     def check(self, target):
         character = self.character
@@ -332,8 +663,21 @@ class MetaCharacter(BasicContext):
         else:
             return target.name == character.name
 
+    def get_name(self):
+        return None if self.character is None else self.character.name
+
+    # A one-tuple, since a None character means anyone
+    def get_genome(self):
+        return self.get_name(),
+
     def __str__(self):
         if self.character is None:
             return 'Anyone'
         else:
             return self.character.name
+
+
+meta_statuses = {
+    HealthMetaStatus.status: HealthMetaStatus,
+    DamageMetaStatus.status: DamageMetaStatus
+}
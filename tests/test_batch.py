@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from batch import *
+from strategy import *
+
+SEED_COUNT = 500
+# Critical value coefficient of the two-sample Kolmogorov-Smirnov test at a 1% significance level
+KS_COEFFICIENT = 1.628
+STRATEGY_SEED = 0
+STRATEGY_NODES = 4
+
+
+# The driver's file name isn't a module name, so it is loaded by path
+def load_driver():
+    specification = importlib.util.spec_from_file_location('driver', os.path.join(ROOT, 'src', '5ebb.py'))
+    driver = importlib.util.module_from_spec(specification)
+    specification.loader.exec_module(driver)
+    return driver
+
+
+def load_manager(game_name):
+    directory = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        driver = load_driver()
+        config = driver.load_config()
+        config[MATCH] = game_name
+        return driver.unload_config(config)
+    finally:
+        os.chdir(directory)
+
+
+def get_ks_statistic(sample, other_sample):
+    sample = sorted(sample)
+    other_sample = sorted(other_sample)
+    statistic = 0
+    i = j = 0
+    while i < len(sample) and j < len(other_sample):
+        value = min(sample[i], other_sample[j])
+        while i < len(sample) and sample[i] == value:
+            i += 1
+        while j < len(other_sample) and other_sample[j] == value:
+            j += 1
+        statistic = max(statistic, abs(i / len(sample) - j / len(other_sample)))
+    return statistic
+
+
+# Every strategy of the game gets STRATEGY_NODES random nodes, the way the optimizer merges novel strategies,
+# from a fixed seed so the test always plays the same ones
+def get_random_strategies(manager):
+    manager.random.seed(STRATEGY_SEED)
+    strategies = {}
+    for strategy_name in manager.strategies.strategies:
+        strategy = Strategy(manager, name=strategy_name)
+        for i in range(STRATEGY_NODES - 1):
+            strategy = strategy.merge(Strategy(manager, name=strategy_name))
+        strategies[strategy_name] = strategy
+    return StrategyMap(manager, strategies)
+
+
+# The batch engine plays the same game as the object engine, so each alignment's fitness
+# has to come out with the same distribution from both
+@unittest.skipIf(numpy is None, "the batch engine needs NumPy")
+class TestBatchMatch(unittest.TestCase):
+    def assert_equivalent(self, game_name, is_random=False):
+        manager = load_manager(game_name)
+        try:
+            strategies = get_random_strategies(manager) if is_random else manager.strategies
+            match = manager.get_match_template()
+            batch = BatchMatch(match, strategies, range(SEED_COUNT))
+            batch.simulate()
+            batch_fitness_sets = batch.get_fitness_sets()
+
+            fitness_sets = []
+            for seed in range(SEED_COUNT, 2 * SEED_COUNT):
+                match.reset(strategies=strategies, seed=seed)
+                match.simulate(sink=NullDisplayMessage)
+                fitness_sets.append(match.get_fitness_set())
+        finally:
+            manager.close()
+
+        critical_value = KS_COEFFICIENT * math.sqrt(2 / SEED_COUNT)
+        for alignment_name in fitness_sets[0]:
+            with self.subTest(alignment=alignment_name):
+                statistic = get_ks_statistic([fitness_set[alignment_name] for fitness_set in batch_fitness_sets],
+                                             [fitness_set[alignment_name] for fitness_set in fitness_sets])
+                self.assertLess(statistic, critical_value)
+
+    def test_1v1(self):
+        self.assert_equivalent('1v1')
+
+    def test_1v2(self):
+        self.assert_equivalent('1v2')
+
+    # The default strategies weigh every action 0, so these make sure the weighing is vectorized the same way
+    def test_1v1_random_strategies(self):
+        self.assert_equivalent('1v1', True)
+
+    def test_1v2_random_strategies(self):
+        self.assert_equivalent('1v2', True)
+
+    def test_movement_falls_back(self):
+        manager = load_manager('1v1_movement')
+        try:
+            with self.assertRaises(Unvectorizable):
+                BatchMatch(manager.get_match_template(), manager.strategies, range(1))
+        finally:
+            manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
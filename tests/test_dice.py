@@ -0,0 +1,73 @@
+import math
+import operator
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from test_batch import load_manager
+from dice import *
+
+SAMPLE_COUNT = 4000
+# How many standard errors a sampled mean may be from the exact one
+SAMPLE_TOLERANCE = 4
+
+
+def get_character(match, name):
+    return select(match.match_characters, lambda character: character.name == name)
+
+
+def get_action(actor, skill_name, target):
+    skill = actor.match_skills[skill_name]
+    return MatchAction(actor, skill, target, skill.get_targeting(actor), base=skill)
+
+
+# Distributions are worked out exactly, so they have to agree with counting outcomes by hand
+# and, for a whole attack, with the mean of the damage it does when it is played out
+class TestDistributions(unittest.TestCase):
+    def setUp(self):
+        self.manager = load_manager('1v1')
+        self.match = self.manager.get_match_template()
+        self.match.reset(strategies=self.manager.strategies, seed=0)
+        self.jazz = get_character(self.match, 'Mr. Jazz')
+        self.goblin = get_character(self.match, 'Super Goblin')
+
+    def tearDown(self):
+        self.manager.close()
+
+    def test_dice_distribution(self):
+        distribution = get_dice_distribution(2, 6)
+        self.assertEqual(distribution.masses, {total: (6 - abs(total - 7)) / 36 for total in range(2, 13)})
+        self.assertAlmostEqual(distribution.get_mean(), 7)
+        self.assertEqual(get_dice_distribution(2, 6, 3).masses,
+                         {total + 3: mass for total, mass in distribution.masses.items()})
+
+    def test_comparison_distribution(self):
+        hit_metric = {ADDITION: {ARGUMENTS: [{DIE_ROLL: {DIE_COUNT: 1, DIE_SIDES: 20}}, 4]}}
+        armor_class = {CONTEXT: {VALUE: 'armor_class'}}
+        with AnalysisScope(self.match):
+            distribution = get_comparison_distribution(self.goblin, [hit_metric, armor_class], operator.ge)
+        # The goblin's armor class is 15, so it takes an 11 or better on the d20
+        self.assertAlmostEqual(distribution.get_probability(True), 10 / 20)
+        self.assertAlmostEqual(distribution.get_probability(False), 10 / 20)
+
+    def test_expected_damage(self):
+        expected_damage = get_expected_damage(get_action(self.jazz, 'heavy_crossbow_attack', self.goblin))
+        self.assertIsNotNone(expected_damage)
+
+        statistics = RunningStatistics()
+        for seed in range(SAMPLE_COUNT):
+            self.match.reset(strategies=self.manager.strategies, seed=seed)
+            goblin = get_character(self.match, 'Super Goblin')
+            hit_points = goblin.resources.get_quantity(HIT_POINT)
+            get_action(get_character(self.match, 'Mr. Jazz'), 'heavy_crossbow_attack', goblin).activate()
+            statistics.add(hit_points - goblin.resources.get_quantity(HIT_POINT))
+        self.assertLess(abs(statistics.mean - expected_damage),
+                        SAMPLE_TOLERANCE * statistics.get_standard_error())
+
+
+if __name__ == '__main__':
+    unittest.main()